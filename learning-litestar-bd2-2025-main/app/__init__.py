@@ -5,17 +5,27 @@ from litestar.openapi import OpenAPIConfig
 from litestar.openapi.plugins import ScalarRenderPlugin, SwaggerRenderPlugin
 from litestar.config.cors import CORSConfig
 
+from app.cache import (
+    ConditionalGetMiddleware,
+    configure_response_cache,
+    response_cache,
+    response_cache_config,
+)
+from app.cli import LibraryCLIPlugin
 from app.config import settings
 from app.controllers.auth import AuthController
 from app.controllers.book import BookController
 from app.controllers.loan import LoanController
+from app.controllers.metrics import MetricsController
 from app.controllers.user import UserController
 from app.controllers.category import CategoryController
 from app.controllers.review import ReviewController
 
 
-from app.db import sqlalchemy_plugin
-from app.security import oauth2_auth
+from app.db import ReplicaRoutingMiddleware, sqlalchemy_plugin
+from app.indexes import start_index_build, stop_index_build
+from app.metrics import MetricsMiddleware
+from app.security import configure_user_cache, oauth2_auth
 
 openapi_config = OpenAPIConfig(
     title="Mi API",
@@ -41,10 +51,16 @@ app = Litestar(
         AuthController,
         CategoryController,
         ReviewController,
+        MetricsController,
     ],
     openapi_config=openapi_config,
     debug=settings.debug,
-    plugins=[sqlalchemy_plugin],
+    plugins=[sqlalchemy_plugin, LibraryCLIPlugin()],
     on_app_init=[oauth2_auth.on_app_init],
+    on_startup=[configure_user_cache, configure_response_cache, start_index_build],
+    on_shutdown=[stop_index_build],
+    stores={"response_cache": response_cache},
+    response_cache_config=response_cache_config,
+    middleware=[MetricsMiddleware(), ReplicaRoutingMiddleware(), ConditionalGetMiddleware()],
     cors_config=cors_config,
 )
\ No newline at end of file
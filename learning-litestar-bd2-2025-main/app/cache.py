@@ -0,0 +1,190 @@
+"""HTTP response caching and conditional GET support."""
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Iterator
+from uuid import uuid4
+
+from litestar import Litestar, Request, Response
+from litestar.config.response_cache import ResponseCacheConfig, default_cache_key_builder
+from litestar.enums import ScopeType
+from litestar.middleware import ASGIMiddleware
+from litestar.stores.base import Store
+from litestar.stores.memory import MemoryStore
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+from msgspec import Struct
+
+from app.config import settings
+from app.models import CursorPage
+
+
+class ResponseCache(Store):
+    """Response cache store that can drop all entries of a resource group at once.
+
+    Keys built by :func:`cache_key` start with a group (``books``,
+    ``categories``). Each group has a generation token kept in ``backend``
+    and prepended to its keys, so replacing the token invalidates every
+    cached response of the group, in every worker sharing the backend.
+    Orphaned entries simply expire.
+    """
+
+    def __init__(self, backend: Store | None = None) -> None:
+        self.backend = backend or MemoryStore()
+
+    async def _key(self, key: str) -> str:
+        group, _, _ = key.partition(":")
+        generation = await self.backend.get(f"generation:{group}")
+        return f"{(generation or b'0').decode()}:{key}"
+
+    async def invalidate(self, *groups: str) -> None:
+        """Invalidate every cached response of ``groups``."""
+        for group in groups:
+            await self.backend.set(f"generation:{group}", uuid4().hex)
+
+    async def set(self, key: str, value: str | bytes, expires_in: int | timedelta | None = None) -> None:
+        await self.backend.set(await self._key(key), value, expires_in)
+
+    async def get(self, key: str, renew_for: int | timedelta | None = None) -> bytes | None:
+        return await self.backend.get(await self._key(key), renew_for)
+
+    async def delete(self, key: str) -> None:
+        await self.backend.delete(await self._key(key))
+
+    async def delete_all(self) -> None:
+        await self.backend.delete_all()
+
+    async def exists(self, key: str) -> bool:
+        return await self.backend.exists(await self._key(key))
+
+    async def expires_in(self, key: str) -> int | None:
+        return await self.backend.expires_in(await self._key(key))
+
+
+response_cache = ResponseCache()
+
+
+def cache_key(request: Request[Any, Any, Any]) -> str:
+    """Cache key grouped by the first path segment (``/books/1`` -> ``books``)."""
+    group = request.url.path.strip("/").split("/", 1)[0]
+    return f"{group}:{default_cache_key_builder(request)}"
+
+
+response_cache_config = ResponseCacheConfig(
+    key_builder=cache_key,
+    store="response_cache",
+)
+
+
+def configure_response_cache(app: Litestar) -> None:
+    """Keep cached responses in the shared store named in settings, if any."""
+    if settings.response_cache_store is not None:
+        response_cache.backend = app.stores.get(settings.response_cache_store)
+
+
+def invalidates(*groups: str) -> Callable[[Response], Awaitable[Response]]:
+    """``after_request`` hook for write handlers that change ``groups``."""
+
+    async def invalidate(response: Response) -> Response:
+        await response_cache.invalidate(*groups)
+        return response
+
+    return invalidate
+
+
+def _versions(content: Any) -> Iterator[tuple[str, Any, datetime]]:
+    """(type, id, updated_at) of every record in an encoded response body."""
+    if isinstance(content, CursorPage):
+        content = content.items
+    if isinstance(content, (list, tuple)):
+        for item in content:
+            yield from _versions(item)
+        return
+    if not isinstance(content, Struct) or not isinstance(getattr(content, "updated_at", None), datetime):
+        return
+
+    yield type(content).__name__, getattr(content, "id", None), content.updated_at
+    # Relaciones incluidas con ?expand=
+    for name in content.__struct_fields__:
+        value = getattr(content, name)
+        if isinstance(value, (Struct, list, tuple)):
+            yield from _versions(value)
+
+
+async def set_cache_validators(response: Response) -> Response:
+    """
+    ``after_request`` hook adding ``ETag`` and ``Last-Modified`` from ``updated_at``.
+
+    The ETag covers the id and ``updated_at`` of every record in the body,
+    including relationships loaded with ``?expand=``, so additions and
+    deletions in a listing change it too. ``Last-Modified`` is only set for
+    a single resource, where it is that record's ``updated_at``.
+    """
+    versions = list(_versions(response.content))
+    if not versions:
+        return response
+
+    digest = hashlib.blake2b(repr(versions).encode(), digest_size=16).hexdigest()
+    response.headers["ETag"] = f'W/"{digest}"'
+    if not isinstance(response.content, (CursorPage, list, tuple)):
+        last_modified = max(updated_at for _, _, updated_at in versions)
+        response.headers["Last-Modified"] = format_datetime(
+            last_modified.astimezone(timezone.utc), usegmt=True
+        )
+    return response
+
+
+def _not_modified(request_headers: dict[bytes, bytes], response_headers: dict[bytes, bytes]) -> bool:
+    if (if_none_match := request_headers.get(b"if-none-match")) is not None:
+        etag = response_headers.get(b"etag")
+        if etag is None:
+            return False
+        tags = {tag.strip().removeprefix(b"W/") for tag in if_none_match.split(b",")}
+        return b"*" in tags or etag.removeprefix(b"W/") in tags
+
+    if_modified_since = request_headers.get(b"if-modified-since")
+    modified = response_headers.get(b"last-modified")
+    if if_modified_since is None or modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(modified.decode()) <= parsedate_to_datetime(if_modified_since.decode())
+    except (TypeError, ValueError):
+        return False
+
+
+class ConditionalGetMiddleware(ASGIMiddleware):
+    """Answer ``304 Not Modified`` when a GET's validators match the response.
+
+    Runs on every response, including those served from the response cache,
+    so a revalidation of a cached page never reaches the database.
+    """
+
+    scopes = (ScopeType.HTTP,)
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send, next_app: ASGIApp) -> None:
+        if scope["method"] not in ("GET", "HEAD"):
+            await next_app(scope, receive, send)
+            return
+
+        request_headers = dict(scope["headers"])
+        not_modified = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal not_modified
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                response_headers = dict(message.get("headers", []))
+                if _not_modified(request_headers, response_headers):
+                    not_modified = True
+                    keep = (b"etag", b"last-modified", b"cache-control", b"vary")
+                    message = {
+                        "type": "http.response.start",
+                        "status": 304,
+                        "headers": [(name, value) for name, value in message.get("headers", []) if name in keep],
+                    }
+            elif message["type"] == "http.response.body" and not_modified:
+                if message.get("more_body", False):
+                    return
+                message = {"type": "http.response.body", "body": b"", "more_body": False}
+            await send(message)
+
+        await next_app(scope, receive, send_wrapper)
@@ -0,0 +1,203 @@
+"""Validation and bulk import of books."""
+
+import csv
+import json
+from typing import Any, AsyncIterator, Literal
+
+from advanced_alchemy.exceptions import IntegrityError
+
+from app.config import settings
+from app.facets import refresh_book_facets
+from app.models import BookImportError, BookImportResult
+from app.repositories.book import BookRepository
+from app.similarity import refresh_similar_books
+
+ImportFormat = Literal["jsonl", "csv"]
+
+# Cuántos errores se detallan en la respuesta (el resto solo se cuenta)
+MAX_REPORTED_ERRORS = 100
+
+REQUIRED_FIELDS = ("title", "author", "isbn", "pages", "published_year", "language")
+INTEGER_FIELDS = ("pages", "published_year", "stock")
+OPTIONAL_FIELDS = ("stock", "description", "publisher")
+
+
+def validate_new_book(book_data: dict[str, Any]) -> None:
+    """Validate the fields of a book about to be created; raises ValueError."""
+    # Validar que el año esté entre 1000 y el año actual
+    if not (1000 <= book_data["published_year"] <= 2024):
+        raise ValueError("El año de publicación debe estar entre 1000 y 2024")
+
+    # Validar que el stock sea > 0 (si no viene, usamos el default 1)
+    stock = book_data.get("stock", 1)
+    if stock <= 0:
+        raise ValueError("El stock debe ser mayor que 0")
+
+    # Validar que language tenga 2 letras (ISO 639-1)
+    language = book_data.get("language")
+    if language is None or len(language) != 2:
+        raise ValueError(
+            "El language debe ser un código ISO 639-1 de 2 letras (ej: 'es', 'en')"
+        )
+
+
+async def _lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into text lines without reading it all in memory."""
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+
+async def _records(
+    stream: AsyncIterator[bytes], format: ImportFormat
+) -> AsyncIterator[tuple[int, str | dict[str, Any]]]:
+    """Yield ``(line number, record)``: a JSON line or a CSV row keyed by header."""
+    line_no = 0
+    if format == "jsonl":
+        # Cada línea se decodifica al validarla, para reportar el error por fila
+        async for line in _lines(stream):
+            line_no += 1
+            if line.strip():
+                yield line_no, line
+        return
+
+    header: list[str] | None = None
+    pending, start = "", 0
+    async for line in _lines(stream):
+        line_no += 1
+        # Un campo entre comillas puede ocupar varias líneas
+        pending, start = (f"{pending}\n{line}", start) if pending else (line, line_no)
+        if pending.count('"') % 2:
+            continue
+        values, pending = next(csv.reader([pending])), ""
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = [name.strip().lstrip("\ufeff") for name in values]
+            continue
+        yield start, dict(zip(header, values))
+
+
+def _book_from_record(record: str | dict[str, Any]) -> dict[str, Any]:
+    """Turn a raw JSON/CSV record into validated ``Book`` column values."""
+    if isinstance(record, str):
+        try:
+            record = json.loads(record)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"JSON inválido: {exc}") from None
+        if not isinstance(record, dict):
+            raise ValueError("Cada línea debe ser un objeto JSON")
+
+    # En CSV los campos vacíos equivalen a no enviarlos
+    record = {
+        key: value for key, value in record.items()
+        if key and value is not None and value != ""
+    }
+
+    missing = [name for name in REQUIRED_FIELDS if name not in record]
+    if missing:
+        raise ValueError(f"Faltan campos obligatorios: {', '.join(missing)}")
+
+    book = {name: record[name] for name in REQUIRED_FIELDS + OPTIONAL_FIELDS if name in record}
+    for name in INTEGER_FIELDS:
+        if name in book:
+            try:
+                book[name] = int(book[name])
+            except (TypeError, ValueError):
+                raise ValueError(f"El campo '{name}' debe ser un entero") from None
+    for name in ("title", "author", "isbn", "language", "description", "publisher"):
+        if name in book:
+            book[name] = str(book[name]).strip()
+
+    validate_new_book(book)
+
+    # categories: [1, 2], [{"category_id": 1}] o "1;2" en CSV
+    categories = record.get("categories") or []
+    if isinstance(categories, str):
+        categories = [item for item in categories.replace(",", ";").split(";") if item.strip()]
+    try:
+        book["category_ids"] = {
+            int(item["category_id"] if isinstance(item, dict) else item)
+            for item in categories
+        }
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Las categorías deben ser ids enteros") from None
+
+    return book
+
+
+async def import_books(
+    stream: AsyncIterator[bytes],
+    format: ImportFormat,
+    books_repo: BookRepository,
+    batch_size: int = settings.book_import_batch_size,
+) -> BookImportResult:
+    """
+    Import books from a JSON Lines or CSV stream in batches.
+
+    Rows are validated like ``POST /books``, upserted by ISBN and linked to
+    their categories; invalid rows are reported without stopping the import.
+    """
+    result = BookImportResult()
+
+    def reject(line: int, detail: str) -> None:
+        result.failed += 1
+        if len(result.errors) < MAX_REPORTED_ERRORS:
+            result.errors.append(BookImportError(line=line, detail=detail))
+
+    async def flush(batch: dict[str, tuple[int, dict[str, Any]]]) -> None:
+        # Filas con categorías inexistentes no se importan
+        wanted = {category_id for _, book in batch.values() for category_id in book["category_ids"]}
+        unknown = wanted - await books_repo.existing_category_ids(wanted)
+        rows = []
+        for line, book in batch.values():
+            if missing := unknown & book["category_ids"]:
+                reject(line, f"Categorías inexistentes: {sorted(missing)}")
+            else:
+                rows.append((line, book))
+
+        try:
+            ids = await books_repo.upsert_many([book for _, book in rows])
+        except IntegrityError:
+            # Algún libro choca con otro (p. ej. título repetido): fila por fila
+            ids = {}
+            for line, book in rows:
+                try:
+                    ids.update(await books_repo.upsert_many([book]))
+                except IntegrityError as exc:
+                    reject(line, exc.detail)
+                else:
+                    result.imported += 1
+        else:
+            result.imported += len(rows)
+
+        await refresh_similar_books(books_repo.session, ids.values())
+        await refresh_book_facets(books_repo.session, ids.values())
+
+    # Indexado por ISBN: un ON CONFLICT no puede tocar la misma fila dos veces
+    batch: dict[str, tuple[int, dict[str, Any]]] = {}
+    async for line, record in _records(stream, format):
+        result.processed += 1
+        try:
+            book = _book_from_record(record)
+        except ValueError as exc:
+            reject(line, str(exc))
+            continue
+        if book["isbn"] in batch:
+            # ISBN repetido: escribir lo anterior para respetar el orden del archivo
+            await flush(batch)
+            batch = {}
+        batch[book["isbn"]] = (line, book)
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = {}
+
+    if batch:
+        await flush(batch)
+
+    return result
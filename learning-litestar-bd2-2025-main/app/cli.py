@@ -0,0 +1,93 @@
+"""Command line tasks, available as ``litestar <group> <command>``."""
+
+from datetime import date
+
+import anyio
+from advanced_alchemy.routing import primary_context
+from click import DateTime, Group, echo, group, option
+from litestar.plugins import CLIPluginProtocol
+
+from app.config import settings
+from app.db import sqlalchemy_config
+from app.models import LoanStatus
+from app.repositories.loan import LoanRepository
+
+
+@group(name="loans")
+def loans_group() -> None:
+    """Manage loans."""
+
+
+@loans_group.command(name="mark-overdue")
+@option(
+    "--today",
+    type=DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    help="Fecha de corte (por defecto, hoy).",
+)
+@option(
+    "--chunk-size",
+    type=int,
+    default=settings.overdue_chunk_size,
+    show_default=True,
+    help="Préstamos por UPDATE.",
+)
+def mark_overdue(today, chunk_size: int) -> None:
+    """Marcar préstamos vencidos y calcular sus multas.
+
+    Pensado para correr una vez al día (cron o similar); repetirlo es seguro.
+    """
+    cutoff = today.date() if today is not None else date.today()
+
+    def progress(status: LoanStatus, updated: int) -> None:
+        echo(f"{status.value}: {updated} préstamos actualizados")
+
+    async def run() -> int:
+        # Con réplicas, leer del primario lo que se va a actualizar
+        with primary_context():
+            async with sqlalchemy_config.get_session() as session:
+                return await LoanRepository(session=session).mark_overdue(
+                    cutoff,
+                    settings.loan_fine_per_day,
+                    chunk_size=chunk_size,
+                    on_progress=progress,
+                )
+
+    updated = anyio.run(run)
+    echo(f"Listo: {updated} préstamos vencidos al {cutoff.isoformat()}")
+
+
+@loans_group.command(name="rebuild-co-borrows")
+@option(
+    "--chunk-size",
+    type=int,
+    default=settings.co_borrow_chunk_size,
+    show_default=True,
+    help="Usuarios por bloque.",
+)
+def rebuild_co_borrows(chunk_size: int) -> None:
+    """Reconstruir el índice "también pidieron" desde la tabla de préstamos.
+
+    Mientras corre, /books/{id}/also-borrowed muestra resultados parciales.
+    """
+
+    def progress(written: int) -> None:
+        echo(f"{written} pares escritos")
+
+    async def run() -> int:
+        with primary_context():
+            async with sqlalchemy_config.get_session() as session:
+                return await LoanRepository(session=session).rebuild_co_borrows(
+                    chunk_size=chunk_size,
+                    on_progress=progress,
+                )
+
+    pairs = anyio.run(run)
+    echo(f"Listo: {pairs} pares de libros en el índice")
+
+
+class LibraryCLIPlugin(CLIPluginProtocol):
+    """Registers the library's commands in the Litestar CLI."""
+
+    def on_cli_init(self, cli: Group) -> None:
+        cli.add_command(loans_group)
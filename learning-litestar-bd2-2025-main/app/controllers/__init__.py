@@ -4,7 +4,13 @@ from typing import Any
 
 from advanced_alchemy.exceptions import DuplicateKeyError, NotFoundError
 from litestar import Request, Response
+from litestar.exceptions import HTTPException
 
+from app.config import settings
+
+from app.passwords import PasswordHasherBusyError
+from app.repositories.fields import InvalidFieldsError
+from app.repositories.pagination import InvalidCursorError
 
 
 def not_found_error_handler(_: Request[Any, Any, Any], __: NotFoundError) -> Response[Any]:
@@ -21,3 +27,50 @@ def duplicate_error_handler(_: Request[Any, Any, Any], __: DuplicateKeyError) ->
         status_code=404,
         content={"status_code": 404, "detail": "Already exists"},
     )
+
+
+def invalid_cursor_error_handler(_: Request[Any, Any, Any], exc: InvalidCursorError) -> Response[Any]:
+    """Handle malformed pagination cursors."""
+    return Response(
+        status_code=400,
+        content={"status_code": 400, "detail": str(exc)},
+    )
+
+
+def invalid_fields_error_handler(_: Request[Any, Any, Any], exc: InvalidFieldsError) -> Response[Any]:
+    """Handle unknown fields in ``?fields=``."""
+    return Response(
+        status_code=400,
+        content={"status_code": 400, "detail": str(exc)},
+    )
+
+
+def hasher_busy_error_handler(_: Request[Any, Any, Any], exc: PasswordHasherBusyError) -> Response[Any]:
+    """Handle a saturated password hashing pool."""
+    return Response(
+        status_code=503,
+        content={"status_code": 503, "detail": str(exc)},
+        headers={"Retry-After": "1"},
+    )
+
+
+def parse_ids(values: list[str]) -> list[int]:
+    """
+    Ids of a multi-get, given as ``?ids=1,2,3`` and/or ``?ids=1&ids=2``.
+
+    Repeated ids are dropped; more than ``multi_get_max_ids`` is a 400.
+    """
+    try:
+        ids = [int(item) for value in values for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Los ids deben ser enteros") from None
+
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise HTTPException(status_code=400, detail="Debe indicar al menos un id")
+    if len(ids) > settings.multi_get_max_ids:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Se pueden pedir hasta {settings.multi_get_max_ids} ids a la vez",
+        )
+    return ids
@@ -9,9 +9,11 @@ from litestar.exceptions import HTTPException
 from litestar.params import Body
 from litestar.security.jwt import OAuth2Login
 
+from app.controllers import hasher_busy_error_handler
 from app.dtos.user import UserLoginDTO
 from app.models import User
-from app.repositories.user import UserRepository, password_hasher, provide_user_repo
+from app.passwords import PasswordHasherBusyError, password_hasher
+from app.repositories.user import UserRepository, provide_user_repo
 from app.security import oauth2_auth
 
 
@@ -20,6 +22,7 @@ class AuthController(Controller):
 
     path = "/auth"
     tags = ["auth"]
+    exception_handlers = {PasswordHasherBusyError: hasher_busy_error_handler}
 
     @post(
         "/login",
@@ -32,10 +35,15 @@ class AuthController(Controller):
         users_repo: UserRepository,
     ) -> Response[OAuth2Login]:
         """Authenticate user and generate OAuth2 token."""
-        user = users_repo.get_one_or_none(username=data.username)
+        user = await users_repo.get_one_or_none(username=data.username)
 
         if user is not None:
-            if password_hasher.verify(data.password, user.password):
+            valid, updated_hash = await password_hasher.verify_and_update(data.password, user.password)
+            if valid:
+                # Re-hashear si cambiaron los parámetros de Argon2
+                if updated_hash is not None:
+                    user.password = updated_hash
+                    await users_repo.update(user)
                 return oauth2_auth.login(identifier=user.username)
 
         raise HTTPException(status_code=401, detail="Usuario o contraseña incorrectos")
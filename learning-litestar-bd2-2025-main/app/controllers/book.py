@@ -3,17 +3,44 @@
 from typing import Annotated, Sequence
 
 from advanced_alchemy.exceptions import DuplicateKeyError, NotFoundError
-from advanced_alchemy.filters import LimitOffset
-from litestar import Controller, delete, get, patch, post
+from litestar import Controller, Request, delete, get, patch, post
 from litestar.di import Provide
 from litestar.dto import DTOData
 from litestar.exceptions import HTTPException
 from litestar.params import Parameter
-
-from app.controllers import duplicate_error_handler, not_found_error_handler
+from litestar.response import Stream
+
+from app.cache import invalidates, set_cache_validators
+from app.catalog import ImportFormat, import_books, validate_new_book
+from app.config import settings
+from app.controllers import (
+    duplicate_error_handler,
+    invalid_cursor_error_handler,
+    invalid_fields_error_handler,
+    not_found_error_handler,
+    parse_ids,
+)
+from app.exports import ExportFormat, export_table
+from app.facets import CategoryMode, book_facets, page_ids, refresh_book_facets
 from app.dtos.book import BookCreateDTO, BookReadDTO, BookUpdateDTO
-from app.models import Book, BookStats, BookCategory
-from app.repositories.book import BookRepository, provide_book_repo
+from app.models import (
+    Book,
+    BookCategory,
+    BookImportResult,
+    BookStats,
+    CursorPage,
+    FacetedPage,
+    SimilarBook,
+    StockAdjustment,
+)
+from app.repositories.book import BookRelation, BookRepository, provide_book_repo
+from app.repositories.fields import FieldsParam, InvalidFieldsError
+from app.repositories.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    InvalidCursorError,
+)
+from app.similarity import refresh_similar_books, similar_books
 
 class BookController(Controller):
     """Controller for book management operations."""
@@ -25,19 +52,137 @@ class BookController(Controller):
     exception_handlers = {
         NotFoundError: not_found_error_handler,
         DuplicateKeyError: duplicate_error_handler,
+        InvalidCursorError: invalid_cursor_error_handler,
+        InvalidFieldsError: invalid_fields_error_handler,
     }
 
-    @get("/")
-    async def list_books(self, books_repo: BookRepository) -> Sequence[Book]:
-        """Get all books."""
-        return books_repo.list()
+    @get("/", cache=settings.book_cache_ttl, after_request=set_cache_validators)
+    async def list_books(
+        self,
+        books_repo: BookRepository,
+        cursor: str | None = None,
+        limit: Annotated[int, Parameter(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+        expand: list[BookRelation] | None = None,
+        fields: FieldsParam = None,
+    ) -> CursorPage[Book]:
+        """Get a page of books."""
+        return await books_repo.list_page(
+            cursor=cursor,
+            limit=limit,
+            load=books_repo.field_options(fields, books_repo.expand_options(expand)),
+        )
+
+    @get("/export")
+    async def export_books(self, format: ExportFormat = "jsonl") -> Stream:
+        """Exportar todos los libros como NDJSON o CSV, sin cargarlos en memoria."""
+        return export_table(Book.__table__, format)
+
+    @get("/batch", cache=settings.book_cache_ttl, after_request=set_cache_validators)
+    async def get_books_batch(
+        self,
+        books_repo: BookRepository,
+        ids: Annotated[list[str], Parameter(description="Ids separados por coma: ?ids=1,2,3")],
+        expand: list[BookRelation] | None = None,
+        fields: FieldsParam = None,
+    ) -> Sequence[Book]:
+        """Varios libros por id en una sola consulta; los ids inexistentes se omiten."""
+        return await books_repo.load_many(
+            parse_ids(ids),
+            load=books_repo.field_options(fields, books_repo.expand_options(expand)),
+        )
+
+    @get("/facets", cache=settings.book_cache_ttl, after_request=set_cache_validators)
+    async def browse_books(
+        self,
+        books_repo: BookRepository,
+        language: list[str] | None = None,
+        publisher: list[str] | None = None,
+        year: Annotated[
+            list[int] | None,
+            Parameter(description="Primer año del tramo (1990 = 1990-1999 con tramos de 10 años)"),
+        ] = None,
+        category: list[int] | None = None,
+        category_mode: CategoryMode = "or",
+        available: bool | None = None,
+        cursor: str | None = None,
+        limit: Annotated[int, Parameter(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+        facet_limit: Annotated[int, Parameter(ge=1, le=MAX_PAGE_SIZE)] = 20,
+    ) -> FacetedPage[Book]:
+        """
+        Navegar el catálogo por facetas: libros que cumplen los filtros y
+        cuántos libros hay por idioma, editorial, tramo de años, categoría y
+        disponibilidad. Los conteos salen de un índice en memoria.
+        """
+        if not book_facets.ready:
+            raise HTTPException(
+                detail="El índice de facetas no está disponible",
+                status_code=503,
+            )
 
-    @get("/{id:int}")
-    async def get_book(self, id: int, books_repo: BookRepository) -> Book:
+        result, facets = book_facets.search(
+            {
+                "language": language or (),
+                "publisher": publisher or (),
+                "published_year": year or (),
+                "category": category or (),
+                "available": () if available is None else (available,),
+            },
+            category_mode=category_mode,
+            facet_limit=facet_limit,
+        )
+        ids, next_cursor, prev_cursor = page_ids(result, cursor, limit)
+        books = await books_repo.list(Book.id.in_(ids)) if ids else []
+
+        return FacetedPage(
+            items=sorted(books, key=lambda book: book.id),
+            total=result.bit_count(),
+            limit=limit,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
+            facets=facets,
+        )
+
+    @get("/{id:int}", cache=settings.book_cache_ttl, after_request=set_cache_validators)
+    async def get_book(
+        self,
+        id: int,
+        books_repo: BookRepository,
+        expand: list[BookRelation] | None = None,
+        fields: FieldsParam = None,
+    ) -> Book:
         """Get a book by ID."""
-        return books_repo.get(id)
+        return await books_repo.get(id, load=books_repo.field_options(fields, books_repo.expand_options(expand)))
+
+    @get("/{id:int}/also-borrowed", cache=settings.book_cache_ttl, after_request=set_cache_validators)
+    async def get_also_borrowed_books(
+        self,
+        id: int,
+        books_repo: BookRepository,
+        limit: Annotated[int, Parameter(ge=1, le=MAX_PAGE_SIZE)] = 10,
+    ) -> Sequence[Book]:
+        """Lectores que pidieron este libro también pidieron... (por cantidad de lectores)."""
+        # 404 si el libro no existe
+        await books_repo.get(id)
+        return await books_repo.get_also_borrowed(id, limit=limit)
+
+    @get("/{id:int}/similar", cache=settings.book_cache_ttl, after_request=set_cache_validators)
+    async def get_similar_books(
+        self,
+        id: int,
+        limit: Annotated[int, Parameter(ge=1, le=MAX_PAGE_SIZE)] = 10,
+    ) -> list[SimilarBook]:
+        """Libros parecidos por título, descripción, autor, editorial y categorías (sin consultar la BD)."""
+        if not similar_books.ready:
+            raise HTTPException(
+                detail="El índice de libros similares no está disponible",
+                status_code=503,
+            )
+        try:
+            return similar_books.similar(id, limit=limit)
+        except KeyError:
+            raise NotFoundError from None
 
-    @post("/", dto=BookCreateDTO)
+    @post("/", dto=BookCreateDTO, after_request=invalidates("books"))
     async def create_book(
         self,
         data: DTOData[Book],
@@ -47,31 +192,16 @@ class BookController(Controller):
         book_data = data.as_builtins()
         category_items = book_data.pop("categories", [])
 
-        # Validar que el año esté entre 1000 y el año actual
-        if not (1000 <= book_data["published_year"] <= 2024):
-            raise HTTPException(
-                detail="El año de publicación debe estar entre 1000 y 2024",
-                status_code=400,
-            )
-
-        # Validar que el stock sea > 0 (si no viene, usamos el default 1)
-        stock = book_data.get("stock", 1)
-        if stock <= 0:
-            raise HTTPException(
-                detail="El stock debe ser mayor que 0",
-                status_code=400,
-            )
-
-        # Validar que language tenga 2 letras (ISO 639-1)
-        language = book_data.get("language")
-        if language is None or len(language) != 2:
+        try:
+            validate_new_book(book_data)
+        except ValueError as exc:
             raise HTTPException(
-                detail="El language debe ser un código ISO 639-1 de 2 letras (ej: 'es', 'en')",
+                detail=str(exc),
                 status_code=400,
             )
 
         # Crear el libro
-        book = books_repo.add(data.create_instance())
+        book = await books_repo.add(data.create_instance())
 
         # Asociar categorías al libro
         for item in category_items:
@@ -79,11 +209,43 @@ class BookController(Controller):
                 BookCategory(book_id=book.id, category_id=item["category_id"])
             )
 
-        books_repo.session.commit()
+        await books_repo.session.commit()
+        await refresh_similar_books(books_repo.session, [book.id])
+        await refresh_book_facets(books_repo.session, [book.id])
 
         return book
 
-    @patch("/{id:int}", dto=BookUpdateDTO)
+    @post(
+        "/bulk",
+        request_max_body_size=settings.book_import_max_body_size,
+        after_request=invalidates("books"),
+    )
+    async def import_books(
+        self,
+        request: Request,
+        books_repo: BookRepository,
+    ) -> BookImportResult:
+        """
+        Importar libros desde un archivo JSON Lines o CSV.
+
+        El cuerpo se procesa por lotes a medida que llega; los libros se
+        insertan o actualizan por ISBN y las filas inválidas se reportan.
+        """
+        content_type, _ = request.content_type
+        format: ImportFormat
+        if content_type in ("application/x-ndjson", "application/jsonl", "application/json-lines"):
+            format = "jsonl"
+        elif content_type == "text/csv":
+            format = "csv"
+        else:
+            raise HTTPException(
+                detail="El archivo debe ser JSON Lines (application/x-ndjson) o CSV (text/csv)",
+                status_code=415,
+            )
+
+        return await import_books(request.stream(), format, books_repo)
+
+    @patch("/{id:int}", dto=BookUpdateDTO, after_request=invalidates("books"))
     async def update_book(
         self,
         id: int,
@@ -109,27 +271,46 @@ class BookController(Controller):
                     status_code=400,
                 )
 
-        book, _ = books_repo.get_and_update(
+        book, _ = await books_repo.get_and_update(
             match_fields="id",
             id=id,
             **update_data,
         )
+        await refresh_similar_books(books_repo.session, [book.id])
+        await refresh_book_facets(books_repo.session, [book.id])
 
         return book
 
-    @delete("/{id:int}")
+    @delete("/{id:int}", after_request=invalidates("books"))
     async def delete_book(self, id: int, books_repo: BookRepository) -> None:
         """Delete a book by ID."""
-        books_repo.delete(id)
+        await books_repo.delete(id)
+        await refresh_similar_books(books_repo.session, [id])
+        await refresh_book_facets(books_repo.session, [id])
 
-    @get("/search/")
-    async def search_book_by_title(
+    @get("/search")
+    async def search_books(
         self,
-        title: str,
         books_repo: BookRepository,
+        q: str | None = None,
+        title: str | None = None,
+        limit: Annotated[int, Parameter(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
     ) -> Sequence[Book]:
-        """Search books by title."""
-        return books_repo.list(Book.title.ilike(f"%{title}%"))
+        """
+        Search books by title, author or description, ranked by relevance.
+
+        ``title`` keeps the previous title-only search working.
+        """
+        if q is None and title is None:
+            raise HTTPException(
+                detail="Debe indicar 'q' o 'title'",
+                status_code=400,
+            )
+
+        if q is None:
+            return await books_repo.list(Book.title.ilike(f"%{title}%"))
+
+        return await books_repo.search(q, limit=limit)
 
     @get("/filter")
     async def filter_books_by_year(
@@ -139,48 +320,30 @@ class BookController(Controller):
         books_repo: BookRepository,
     ) -> Sequence[Book]:
         """Filter books by published year."""
-        return books_repo.list(Book.published_year.between(year_from, to))
+        return await books_repo.list(Book.published_year.between(year_from, to))
 
     @get("/recent")
     async def get_recent_books(
         self,
         limit: Annotated[int, Parameter(query="limit", default=10, ge=1, le=50)],
         books_repo: BookRepository,
-    ) -> Sequence[Book]:
+        cursor: str | None = None,
+    ) -> CursorPage[Book]:
         """Get most recent books."""
-        return books_repo.list(
-            LimitOffset(offset=0, limit=limit),
-            order_by=Book.created_at.desc(),
+        return await books_repo.list_page(
+            cursor=cursor,
+            limit=limit,
+            keyset=("created_at", "id"),
+            descending=True,
         )
 
-    @get("/stats")
+    @get("/stats", cache=settings.book_stats_cache_ttl)
     async def get_book_stats(
         self,
         books_repo: BookRepository,
     ) -> BookStats:
         """Get statistics about books."""
-        total_books = books_repo.count()
-        if total_books == 0:
-            return BookStats(
-                total_books=0,
-                average_pages=0,
-                oldest_publication_year=None,
-                newest_publication_year=None,
-            )
-
-        books = books_repo.list()
-
-        average_pages = sum(book.pages for book in books) / total_books
-        oldest_year = min(book.published_year for book in books)
-        newest_year = max(book.published_year for book in books)
-
-        return BookStats(
-            total_books=total_books,
-            average_pages=average_pages,
-            oldest_publication_year=oldest_year,
-            newest_publication_year=newest_year,
-        )
-
+        return await books_repo.get_stats()
 
     @get("/available")
     async def get_available_books(
@@ -188,7 +351,7 @@ class BookController(Controller):
         books_repo: BookRepository,
     ) -> Sequence[Book]:
         """Retornar libros con stock > 0."""
-        return books_repo.get_available_books()
+        return await books_repo.get_available_books()
 
     @get("/by-category/{category_id:int}")
     async def get_books_by_category(
@@ -197,18 +360,28 @@ class BookController(Controller):
         books_repo: BookRepository,
     ) -> Sequence[Book]:
         """Buscar libros de una categoría específica."""
-        return books_repo.find_by_category(category_id)
+        return await books_repo.find_by_category(category_id)
 
-    @get("/most-reviewed")
+    @get("/most-reviewed", cache=settings.book_cache_ttl, after_request=set_cache_validators)
     async def get_most_reviewed_books(
         self,
         books_repo: BookRepository,
         limit: Annotated[int, Parameter(query="limit", default=10, ge=1)],
     ) -> Sequence[Book]:
         """Libros ordenados por cantidad de reseñas (desc)."""
-        return books_repo.get_most_reviewed_books(limit=limit)
+        return await books_repo.get_most_reviewed_books(limit=limit)
 
-    @patch("/{book_id:int}/stock")
+    @get("/top-rated", cache=settings.book_cache_ttl, after_request=set_cache_validators)
+    async def get_top_rated_books(
+        self,
+        books_repo: BookRepository,
+        limit: Annotated[int, Parameter(query="limit", default=10, ge=1)],
+        min_reviews: Annotated[int, Parameter(query="min_reviews", default=1, ge=1)],
+    ) -> Sequence[Book]:
+        """Libros ordenados por calificación promedio (desc)."""
+        return await books_repo.get_top_rated_books(limit=limit, min_reviews=min_reviews)
+
+    @patch("/{book_id:int}/stock", after_request=invalidates("books"))
     async def update_book_stock(
         self,
         book_id: int,
@@ -219,7 +392,24 @@ class BookController(Controller):
         Actualizar stock de un libro.
         """
         try:
-            return books_repo.update_stock(book_id, quantity)
+            return await books_repo.update_stock(book_id, quantity)
+        except ValueError as exc:
+            raise HTTPException(
+                status_code=400,
+                detail=str(exc),
+            )
+
+    @patch("/stock", after_request=invalidates("books"))
+    async def update_books_stock(
+        self,
+        data: list[StockAdjustment],
+        books_repo: BookRepository,
+    ) -> Sequence[Book]:
+        """
+        Actualizar el stock de varios libros en una sola operación.
+        """
+        try:
+            return await books_repo.update_stock_many(data)
         except ValueError as exc:
             raise HTTPException(
                 status_code=400,
@@ -233,4 +423,4 @@ class BookController(Controller):
         books_repo: BookRepository,
     ) -> Sequence[Book]:
         """Buscar libros por nombre de autor (búsqueda parcial, ilike)."""
-        return books_repo.search_by_author(author_name)
+        return await books_repo.search_by_author(author_name)
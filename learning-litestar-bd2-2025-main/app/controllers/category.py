@@ -1,13 +1,17 @@
 """Controller for Category."""
 
-from typing import Sequence
+from typing import Annotated
 
 from advanced_alchemy.exceptions import DuplicateKeyError, NotFoundError
 from litestar import Controller, get, post, patch, delete
 from litestar.di import Provide
 from litestar.dto import DTOData
+from litestar.params import Parameter
 
-from app.controllers import not_found_error_handler, duplicate_error_handler
+from app.cache import invalidates, set_cache_validators
+from app.config import settings
+from app.controllers import not_found_error_handler, duplicate_error_handler, invalid_cursor_error_handler
+from app.facets import remove_category
 
 
 from app.dtos.category import (
@@ -15,8 +19,13 @@ from app.dtos.category import (
     CategoryCreateDTO,
     CategoryUpdateDTO,
 )
-from app.models import Category
+from app.models import Category, CursorPage
 from app.repositories.category import CategoryRepository, provide_category_repo
+from app.repositories.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    InvalidCursorError,
+)
 
 
 class CategoryController(Controller):
@@ -30,38 +39,46 @@ class CategoryController(Controller):
     exception_handlers = {
         NotFoundError: not_found_error_handler,
         DuplicateKeyError: duplicate_error_handler,
+        InvalidCursorError: invalid_cursor_error_handler,
     }
 
-    @get("/")
-    async def list_categories(self, categories_repo: CategoryRepository) -> Sequence[Category]:
-        return categories_repo.list()
+    @get("/", cache=settings.category_cache_ttl, after_request=set_cache_validators)
+    async def list_categories(
+        self,
+        categories_repo: CategoryRepository,
+        cursor: str | None = None,
+        limit: Annotated[int, Parameter(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+    ) -> CursorPage[Category]:
+        return await categories_repo.list_page(cursor=cursor, limit=limit)
 
-    @get("/{id:int}")
+    @get("/{id:int}", cache=settings.category_cache_ttl, after_request=set_cache_validators)
     async def get_category(self, id: int, categories_repo: CategoryRepository) -> Category:
-        return categories_repo.get(id)
+        return await categories_repo.get(id)
 
-    @post("/", dto=CategoryCreateDTO)
+    @post("/", dto=CategoryCreateDTO, after_request=invalidates("categories"))
     async def create_category(
         self,
         data: DTOData[Category],
         categories_repo: CategoryRepository,
     ) -> Category:
-        return categories_repo.add(data.create_instance())
+        return await categories_repo.add(data.create_instance())
 
-    @patch("/{id:int}", dto=CategoryUpdateDTO)
+    # Las estadísticas de libros muestran los nombres de las categorías
+    @patch("/{id:int}", dto=CategoryUpdateDTO, after_request=invalidates("categories", "books"))
     async def update_category(
         self,
         id: int,
         data: DTOData[Category],
         categories_repo: CategoryRepository,
     ) -> Category:
-        category, _ = categories_repo.get_and_update(
+        category, _ = await categories_repo.get_and_update(
             match_fields="id",
             id=id,
             **data.as_builtins(),
         )
         return category
 
-    @delete("/{id:int}")
+    @delete("/{id:int}", after_request=invalidates("categories", "books"))
     async def delete_category(self, id: int, categories_repo: CategoryRepository) -> None:
-        categories_repo.delete(id)
+        await categories_repo.delete(id)
+        remove_category(id)
@@ -1,18 +1,36 @@
 """Controller for Loan endpoints."""
 
-from typing import Sequence
+from datetime import date, datetime, timedelta
+from typing import Annotated, Sequence
 
 from advanced_alchemy.exceptions import DuplicateKeyError, NotFoundError
 from litestar import Controller, delete, get, patch, post
 from litestar.di import Provide
 from litestar.dto import DTOData
-
-from app.controllers import duplicate_error_handler, not_found_error_handler
+from litestar.exceptions import HTTPException
+from litestar.params import Parameter
+from litestar.response import Stream
+
+from app.cache import invalidates
+from app.config import settings
+from app.controllers import (
+    duplicate_error_handler,
+    invalid_cursor_error_handler,
+    invalid_fields_error_handler,
+    not_found_error_handler,
+    parse_ids,
+)
 from app.dtos.loan import LoanCreateDTO, LoanReadDTO, LoanUpdateDTO
-from app.models import Loan, LoanStatus
-from app.repositories.loan import LoanRepository, provide_loan_repo
-
-from datetime import datetime, timedelta
+from app.exports import ExportFormat, export_table
+from app.models import CursorPage, Loan, LoanCheckout, LoanStatus, StockAdjustment
+from app.repositories.book import BookRepository, provide_book_repo
+from app.repositories.fields import FieldsParam, InvalidFieldsError
+from app.repositories.loan import LoanRelation, LoanRepository, provide_loan_repo
+from app.repositories.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    InvalidCursorError,
+)
 
 
 class LoanController(Controller):
@@ -21,52 +39,180 @@ class LoanController(Controller):
     path = "/loans"
     tags = ["loans"]
     return_dto = LoanReadDTO
-    dependencies = {"loans_repo": Provide(provide_loan_repo)}
+    dependencies = {
+        "loans_repo": Provide(provide_loan_repo),
+        "books_repo": Provide(provide_book_repo),
+    }
     exception_handlers = {
         NotFoundError: not_found_error_handler,
         DuplicateKeyError: duplicate_error_handler,
+        InvalidCursorError: invalid_cursor_error_handler,
+        InvalidFieldsError: invalid_fields_error_handler,
     }
 
     @get("/")
-    async def list_loans(self, loans_repo: LoanRepository) -> Sequence[Loan]:
-        """Get all loans."""
-        return loans_repo.list()
+    async def list_loans(
+        self,
+        loans_repo: LoanRepository,
+        cursor: str | None = None,
+        limit: Annotated[int, Parameter(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+        expand: list[LoanRelation] | None = None,
+        fields: FieldsParam = None,
+    ) -> CursorPage[Loan]:
+        """Get a page of loans."""
+        return await loans_repo.list_page(
+            cursor=cursor,
+            limit=limit,
+            load=loans_repo.field_options(fields, loans_repo.expand_options(expand)),
+        )
+
+    @get("/export")
+    async def export_loans(self, format: ExportFormat = "jsonl") -> Stream:
+        """Exportar todos los préstamos como NDJSON o CSV, sin cargarlos en memoria."""
+        return export_table(Loan.__table__, format)
+
+    @get("/batch")
+    async def get_loans_batch(
+        self,
+        loans_repo: LoanRepository,
+        ids: Annotated[list[str], Parameter(description="Ids separados por coma: ?ids=1,2,3")],
+        expand: list[LoanRelation] | None = None,
+        fields: FieldsParam = None,
+    ) -> Sequence[Loan]:
+        """Varios préstamos por id en una sola consulta; los ids inexistentes se omiten."""
+        return await loans_repo.load_many(
+            parse_ids(ids),
+            load=loans_repo.field_options(fields, loans_repo.expand_options(expand)),
+        )
 
     @get("/{id:int}")
-    async def get_loan(self, id: int, loans_repo: LoanRepository) -> Loan:
+    async def get_loan(
+        self,
+        id: int,
+        loans_repo: LoanRepository,
+        expand: list[LoanRelation] | None = None,
+        fields: FieldsParam = None,
+    ) -> Loan:
         """Get a loan by ID."""
-        return loans_repo.get(id)
+        return await loans_repo.get(id, load=loans_repo.field_options(fields, loans_repo.expand_options(expand)))
 
-    @post("/", dto=LoanCreateDTO)
+    # Los préstamos cambian el stock de los libros (y ?expand=loans)
+    @post("/", dto=LoanCreateDTO, after_request=invalidates("books"))
     async def create_loan(
         self,
         data: DTOData[Loan],
         loans_repo: LoanRepository,
+        books_repo: BookRepository,
     ) -> Loan:
         """Create a new loan."""
 
         loan = data.create_instance()
+        loans = await self._checkout(
+            loans_repo, books_repo, loan.user_id, [loan.book_id], loan.loan_dt
+        )
+        return loans[0]
 
-        # Asegurar loan_dt
-        if loan.loan_dt is None:
-            loan.loan_dt = datetime.today().date()
-
-        # due_date = loan_dt + 14 días
-        loan.due_date = loan.loan_dt + timedelta(days=14)
+    @post("/checkout", after_request=invalidates("books"))
+    async def checkout_books(
+        self,
+        data: LoanCheckout,
+        loans_repo: LoanRepository,
+        books_repo: BookRepository,
+    ) -> Sequence[Loan]:
+        """Prestar varios libros a un usuario en una sola transacción."""
+        if not data.book_ids:
+            raise HTTPException(
+                status_code=400,
+                detail="Debe indicar al menos un libro",
+            )
+        return await self._checkout(
+            loans_repo, books_repo, data.user_id, data.book_ids, data.loan_dt
+        )
 
-        # Status por defecto
-        loan.status = LoanStatus.ACTIVE
+    @staticmethod
+    async def _checkout(
+        loans_repo: LoanRepository,
+        books_repo: BookRepository,
+        user_id: int,
+        book_ids: list[int],
+        loan_dt: date | None,
+    ) -> Sequence[Loan]:
+        # Asegurar loan_dt
+        if loan_dt is None:
+            loan_dt = datetime.today().date()
+
+        # Descontar stock con un UPDATE condicional: nunca se presta de más
+        try:
+            await books_repo.update_stock_many(
+                [StockAdjustment(book_id=book_id, quantity=-1) for book_id in book_ids],
+                auto_commit=False,
+            )
+        except ValueError as exc:
+            raise HTTPException(
+                status_code=400,
+                detail=str(exc),
+            )
+
+        # due_date = loan_dt + 14 días, status ACTIVE y fine_amount en None;
+        # los préstamos, el stock y el índice de co-préstamos se confirman juntos
+        loans = await loans_repo.add_many(
+            [
+                Loan(
+                    user_id=user_id,
+                    book_id=book_id,
+                    loan_dt=loan_dt,
+                    due_date=loan_dt + timedelta(days=14),
+                    status=LoanStatus.ACTIVE,
+                    return_dt=None,
+                    fine_amount=None,
+                )
+                for book_id in book_ids
+            ],
+            auto_commit=False,
+        )
+        await loans_repo.add_co_borrows(loans)
+        return loans
 
-        # fine_amount se deja en None al inicio
-        return loans_repo.add(loan)
+    @post("/{id:int}/return", after_request=invalidates("books"))
+    async def return_loan(
+        self,
+        id: int,
+        loans_repo: LoanRepository,
+        books_repo: BookRepository,
+    ) -> Loan:
+        """Devolver un préstamo y reponer el stock del libro."""
+        return await self._return(loans_repo, books_repo, id)
 
+    @staticmethod
+    async def _return(
+        loans_repo: LoanRepository,
+        books_repo: BookRepository,
+        id: int,
+    ) -> Loan:
+        try:
+            loan = await loans_repo.mark_returned(
+                id,
+                datetime.today().date(),
+                settings.loan_fine_per_day,
+                auto_commit=False,
+            )
+        except ValueError as exc:
+            raise HTTPException(
+                status_code=400,
+                detail=str(exc),
+            )
+
+        # El préstamo y el stock se confirman juntos
+        await books_repo.update_stock(loan.book_id, 1)
+        return loan
 
-    @patch("/{id:int}", dto=LoanUpdateDTO)
+    @patch("/{id:int}", dto=LoanUpdateDTO, after_request=invalidates("books"))
     async def update_loan(
         self,
         id: int,
         data: DTOData[Loan],
         loans_repo: LoanRepository,
+        books_repo: BookRepository,
     ) -> Loan:
         """Update a loan by ID."""
 
@@ -78,16 +224,24 @@ class LoanController(Controller):
         for key in extra_keys:
             update_data.pop(key, None)
 
-        loan, _ = loans_repo.get_and_update(
+        # Devolver por PATCH también repone el stock
+        if update_data.get("status") == LoanStatus.RETURNED:
+            return await self._return(loans_repo, books_repo, id)
+
+        if (await loans_repo.get(id)).status == LoanStatus.RETURNED:
+            raise HTTPException(
+                status_code=400,
+                detail="Un préstamo devuelto no puede reabrirse",
+            )
+
+        loan, _ = await loans_repo.get_and_update(
             match_fields="id",
             id=id,
             **update_data,
         )
         return loan
 
-
-
-    @delete("/{id:int}")
+    @delete("/{id:int}", after_request=invalidates("books"))
     async def delete_loan(self, id: int, loans_repo: LoanRepository) -> None:
         """Delete a loan by ID."""
-        loans_repo.delete(id)
+        await loans_repo.delete(id)
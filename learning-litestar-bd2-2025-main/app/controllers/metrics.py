@@ -0,0 +1,42 @@
+"""Controller for operational metrics."""
+
+from typing import Annotated
+
+from litestar import Controller, get
+from litestar.params import Parameter
+
+from app.db import pool_stats
+from app.metrics import render_metrics
+from app.models import PoolStats, SlowQuery
+from app.security import admin_guard
+from app.slow_queries import slow_queries
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4"
+
+
+class MetricsController(Controller):
+    """Controller exposing runtime metrics of this worker."""
+
+    path = "/metrics"
+    tags = ["metrics"]
+
+    @get("/", media_type=PROMETHEUS_MEDIA_TYPE)
+    async def get_metrics(self) -> str:
+        """Métricas de requests y consultas en formato Prometheus (sin autenticación)."""
+        return render_metrics()
+
+    @get("/pool")
+    async def get_pool_stats(self) -> PoolStats:
+        """Estado del pool de conexiones a la base de datos de este worker."""
+        return pool_stats()
+
+    @get("/slow-queries", guards=[admin_guard])
+    async def get_slow_queries(
+        self,
+        limit: Annotated[int, Parameter(ge=1, le=1000)] = 50,
+    ) -> list[SlowQuery]:
+        """Consultas lentas más recientes de este worker (solo administradores).
+
+        Requiere SLOW_QUERY_THRESHOLD_MS; el plan solo está en una muestra de ellas.
+        """
+        return list(reversed(slow_queries))[:limit]
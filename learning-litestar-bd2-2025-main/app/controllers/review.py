@@ -1,43 +1,69 @@
 """Controller for Review"""
 
-from typing import Sequence
+from typing import Annotated
 
 from litestar import Controller, get, post, patch, delete
 from litestar.di import Provide
 from litestar.dto import DTOData
+from litestar.params import Parameter
+from litestar.response import Stream
 from litestar.exceptions import HTTPException
 
 from advanced_alchemy.exceptions import NotFoundError, DuplicateKeyError
 
-from app.controllers import not_found_error_handler, duplicate_error_handler
+from app.cache import invalidates
+from app.controllers import not_found_error_handler, duplicate_error_handler, invalid_cursor_error_handler
 from app.dtos.review import ReviewReadDTO, ReviewCreateDTO, ReviewUpdateDTO
-from app.models import Review
+from app.exports import ExportFormat, export_table
+from app.models import Review, CursorPage
+from app.repositories.book import BookRepository, provide_book_repo
 from app.repositories.review import ReviewRepository, provide_review_repo
+from app.repositories.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    InvalidCursorError,
+)
 
 
 class ReviewController(Controller):
     path = "/reviews"
     tags = ["reviews"]
     return_dto = ReviewReadDTO
-    dependencies = {"reviews_repo": Provide(provide_review_repo)}
+    dependencies = {
+        "reviews_repo": Provide(provide_review_repo),
+        "books_repo": Provide(provide_book_repo),
+    }
     exception_handlers = {
         NotFoundError: not_found_error_handler,
         DuplicateKeyError: duplicate_error_handler,
+        InvalidCursorError: invalid_cursor_error_handler,
     }
 
     @get("/")
-    async def list_reviews(self, reviews_repo: ReviewRepository) -> Sequence[Review]:
-        return reviews_repo.list()
+    async def list_reviews(
+        self,
+        reviews_repo: ReviewRepository,
+        cursor: str | None = None,
+        limit: Annotated[int, Parameter(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+    ) -> CursorPage[Review]:
+        return await reviews_repo.list_page(cursor=cursor, limit=limit)
+
+    @get("/export")
+    async def export_reviews(self, format: ExportFormat = "jsonl") -> Stream:
+        """Exportar todas las reseñas como NDJSON o CSV, sin cargarlas en memoria."""
+        return export_table(Review.__table__, format)
 
     @get("/{id:int}")
     async def get_review(self, id: int, reviews_repo: ReviewRepository) -> Review:
-        return reviews_repo.get(id)
+        return await reviews_repo.get(id)
 
-    @post("/", dto=ReviewCreateDTO)
+    # Las reseñas cambian las estadísticas de los libros
+    @post("/", dto=ReviewCreateDTO, after_request=invalidates("books"))
     async def create_review(
         self,
         data: DTOData[Review],
         reviews_repo: ReviewRepository,
+        books_repo: BookRepository,
     ) -> Review:
 
         # Validación rating entre 1 y 5
@@ -46,22 +72,39 @@ class ReviewController(Controller):
             raise HTTPException(status_code=400, detail="rating must be between 1 and 5")
 
         review = data.create_instance()
-        return reviews_repo.add(review)
+        review = await reviews_repo.add(review, auto_commit=False)
+
+        # Las estadísticas del libro se actualizan en la misma transacción
+        await books_repo.refresh_review_stats(review.book_id)
+        return review
 
-    @patch("/{id:int}", dto=ReviewUpdateDTO)
+    @patch("/{id:int}", dto=ReviewUpdateDTO, after_request=invalidates("books"))
     async def update_review(
         self,
         id: int,
         data: DTOData[Review],
         reviews_repo: ReviewRepository,
+        books_repo: BookRepository,
     ) -> Review:
-        review, _ = reviews_repo.get_and_update(
+        # La reseña puede cambiar de libro: se recalculan ambos
+        previous_book_id = (await reviews_repo.get(id)).book_id
+
+        review, _ = await reviews_repo.get_and_update(
             match_fields="id",
             id=id,
+            auto_commit=False,
             **data.as_builtins(),
         )
+
+        await books_repo.refresh_review_stats(previous_book_id, review.book_id)
         return review
 
-    @delete("/{id:int}")
-    async def delete_review(self, id: int, reviews_repo: ReviewRepository) -> None:
-        reviews_repo.delete(id)
+    @delete("/{id:int}", after_request=invalidates("books"))
+    async def delete_review(
+        self,
+        id: int,
+        reviews_repo: ReviewRepository,
+        books_repo: BookRepository,
+    ) -> None:
+        review = await reviews_repo.delete(id, auto_commit=False)
+        await books_repo.refresh_review_stats(review.book_id)
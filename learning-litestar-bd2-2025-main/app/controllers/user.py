@@ -1,18 +1,34 @@
 """Controller for User endpoints."""
 
-from typing import Sequence
+from typing import Annotated, Sequence
 
 
 from advanced_alchemy.exceptions import DuplicateKeyError, NotFoundError
 from litestar import Controller, delete, get, patch, post
 from litestar.di import Provide
 from litestar.dto import DTOData
+from litestar.params import Parameter
 from litestar.exceptions import HTTPException
 
-from app.controllers import duplicate_error_handler, not_found_error_handler
+from app.controllers import (
+    duplicate_error_handler,
+    hasher_busy_error_handler,
+    invalid_cursor_error_handler,
+    invalid_fields_error_handler,
+    not_found_error_handler,
+    parse_ids,
+)
 from app.dtos.user import UserCreateDTO, UserReadDTO, UserUpdateDTO
-from app.models import PasswordUpdate, User
+from app.models import PasswordUpdate, User, CursorPage
+from app.passwords import PasswordHasherBusyError, password_hasher
+from app.repositories.fields import FieldsParam, InvalidFieldsError
 from app.repositories.user import UserRepository, provide_user_repo
+from app.security import user_cache
+from app.repositories.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    InvalidCursorError,
+)
 
 import re  # ChatGPT me indicó que sirve para el correo
 EMAIL_REGEX = re.compile(r"^[^@]+@[^@]+\.[^@]+$")
@@ -28,17 +44,41 @@ class UserController(Controller):
     exception_handlers = {
         NotFoundError: not_found_error_handler,
         DuplicateKeyError: duplicate_error_handler,
+        InvalidCursorError: invalid_cursor_error_handler,
+        InvalidFieldsError: invalid_fields_error_handler,
+        PasswordHasherBusyError: hasher_busy_error_handler,
     }
 
     @get("/")
-    async def list_users(self, users_repo: UserRepository) -> Sequence[User]:
-        """Get all users."""
-        return users_repo.list()
+    async def list_users(
+        self,
+        users_repo: UserRepository,
+        cursor: str | None = None,
+        limit: Annotated[int, Parameter(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+        fields: FieldsParam = None,
+    ) -> CursorPage[User]:
+        """Get a page of users."""
+        return await users_repo.list_page(cursor=cursor, limit=limit, load=users_repo.field_options(fields))
+
+    @get("/batch")
+    async def get_users_batch(
+        self,
+        users_repo: UserRepository,
+        ids: Annotated[list[str], Parameter(description="Ids separados por coma: ?ids=1,2,3")],
+        fields: FieldsParam = None,
+    ) -> Sequence[User]:
+        """Varios usuarios por id en una sola consulta; los ids inexistentes se omiten."""
+        return await users_repo.load_many(parse_ids(ids), load=users_repo.field_options(fields))
 
     @get("/{id:int}")
-    async def get_user(self, id: int, users_repo: UserRepository) -> User:
+    async def get_user(
+        self,
+        id: int,
+        users_repo: UserRepository,
+        fields: FieldsParam = None,
+    ) -> User:
         """Get a user by ID."""
-        return users_repo.get(id)
+        return await users_repo.get(id, load=users_repo.field_options(fields))
 
     @post("/", dto=UserCreateDTO)
     async def create_user(
@@ -58,7 +98,7 @@ class UserController(Controller):
                 detail="El email no tiene un formato válido",
             )
 
-        return users_repo.add_with_hashed_password(data)
+        return await users_repo.add_with_hashed_password(data)
 
     @patch("/{id:int}", dto=UserUpdateDTO)
     async def update_user(
@@ -79,12 +119,21 @@ class UserController(Controller):
                     detail="El email no tiene un formato válido",
                 )
 
-        user, _ = users_repo.get_and_update(
+        # get_and_update modifica la misma instancia: guardar el username anterior
+        previous_username = (await users_repo.get(id)).username
+
+        user, _ = await users_repo.get_and_update(
             match_fields="id",
             id=id,
             **update_data,
         )
 
+        # Después del commit, para que un request concurrente no vuelva a cachear
+        # el usuario anterior; si cambió el username, se invalidan ambos
+        await user_cache.invalidate(previous_username)
+        if user.username != previous_username:
+            await user_cache.invalidate(user.username)
+
         return user
 
     @post("/{id:int}/update-password", status_code=204)
@@ -95,18 +144,20 @@ class UserController(Controller):
         users_repo: UserRepository,
     ) -> None:
         """Update a user's password."""
-        user = users_repo.get(id)
+        user = await users_repo.get(id)
 
-        if user.password != data.current_password:
+        if not await password_hasher.verify(data.current_password, user.password):
             raise HTTPException(
                 detail="Contraseña incorrecta",
                 status_code=401,
             )
 
-        user.password = data.new_password
-        users_repo.update(user)
+        user.password = await password_hasher.hash(data.new_password)
+        await users_repo.update(user)
+        await user_cache.invalidate(user.username)
 
     @delete("/{id:int}")
     async def delete_user(self, id: int, users_repo: UserRepository) -> None:
         """Delete a user by ID."""
-        users_repo.delete(id)
+        user = await users_repo.delete(id)
+        await user_cache.invalidate(user.username)
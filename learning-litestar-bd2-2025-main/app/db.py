@@ -1,9 +1,178 @@
 """Database configuration with SQLAlchemy."""
 
-from advanced_alchemy.extensions.litestar import SQLAlchemyPlugin, SQLAlchemySyncConfig
+import time
+
+from advanced_alchemy.config import EngineConfig
+from advanced_alchemy.config.routing import RoutingConfig
+from advanced_alchemy.extensions.litestar import (
+    AsyncSessionConfig,
+    SQLAlchemyAsyncConfig,
+    SQLAlchemyPlugin,
+)
+from advanced_alchemy.routing import RoutingAsyncSessionMaker, force_primary_var
+from litestar.connection import ASGIConnection
+from litestar.datastructures import Cookie, State
+from litestar.enums import ScopeType
+from litestar.middleware import ASGIMiddleware
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.config import settings
+from app.models import PoolStats
+
+
+class MonitoredQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that counts checkouts, timeouts and the time spent waiting for them."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        self.checkouts += 1
+        return connection
+
+
+def _engine_config() -> EngineConfig:
+    url = make_url(settings.database_url)
+
+    # SQLite en memoria usa una sola conexión compartida (StaticPool)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return EngineConfig()
+
+    connect_args = {}
+    if url.get_backend_name() == "postgresql" and settings.db_statement_timeout is not None:
+        connect_args["options"] = f"-c statement_timeout={settings.db_statement_timeout}"
+
+    return EngineConfig(
+        poolclass=MonitoredQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args=connect_args,
+    )
+
+
+STICKY_COOKIE = "read_primary"
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+def _reads_primary(scope: Scope) -> bool:
+    """Whether a request must read from the primary instead of a replica."""
+    return scope["method"] not in SAFE_METHODS or STICKY_COOKIE in ASGIConnection(scope).cookies
+
+
+class RoutingAsyncConfig(SQLAlchemyAsyncConfig):
+    """SQLAlchemy config that sends reads to the replicas only when it is safe.
 
-sqlalchemy_config = SQLAlchemySyncConfig(connection_string=settings.database_url)
+    Requests that write, and reads from a client that wrote within the last
+    ``replica_sticky_seconds``, run entirely on the primary. Other reads go to
+    the replicas, and statements that write always go to the primary.
+    """
+
+    def provide_session(self, state: State, scope: Scope) -> AsyncSession:
+        # provide_session reinicia el contexto de ruteo al crear la sesión
+        session = super().provide_session(state, scope)
+        if self.routing_config is not None and _reads_primary(scope):
+            force_primary_var.set(True)
+        return session
+
+
+class ReplicaRoutingMiddleware(ASGIMiddleware):
+    """Keep a client on the primary for a while after it writes.
+
+    A successful request other than GET/HEAD/OPTIONS sets a short-lived
+    cookie; while it lasts, the client's reads skip the replicas
+    (read-your-writes across requests, covering replication lag).
+    """
+
+    scopes = (ScopeType.HTTP,)
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send, next_app: ASGIApp) -> None:
+        if not settings.database_replica_urls or scope["method"] in SAFE_METHODS:
+            await next_app(scope, receive, send)
+            return
+
+        cookie = Cookie(
+            key=STICKY_COOKIE,
+            value="1",
+            max_age=settings.replica_sticky_seconds,
+            httponly=True,
+        ).to_header(header="")
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        await next_app(scope, receive, send_wrapper)
+
+
+sqlalchemy_config = RoutingAsyncConfig(
+    # Con réplicas, las lecturas van a ellas y las escrituras al primario
+    connection_string=None if settings.database_replica_urls else settings.database_url,
+    routing_config=RoutingConfig(
+        primary_connection_string=settings.database_url,
+        read_replicas=list(settings.database_replica_urls),
+        # Tras escribir, el resto del request sigue en el primario
+        reset_stickiness_on_commit=False,
+    ) if settings.database_replica_urls else None,
+    engine_config=_engine_config(),
+    # Las relaciones no se pueden cargar de forma perezosa fuera de un await,
+    # así que los objetos no deben expirar al hacer commit.
+    session_config=AsyncSessionConfig(expire_on_commit=False),
+)
 
 sqlalchemy_plugin = SQLAlchemyPlugin(config=sqlalchemy_config)
+
+
+def pool_stats() -> PoolStats:
+    """Current state of the connection pools of this worker (primary and replicas)."""
+    session_maker = sqlalchemy_config.create_session_maker()
+    if not isinstance(session_maker, RoutingAsyncSessionMaker):
+        return _pool_stats(sqlalchemy_config.get_engine())
+
+    stats = _pool_stats(session_maker.primary_engine)
+    stats.replicas = [_pool_stats(engine) for engine in session_maker.replica_engines]
+    return stats
+
+
+def _pool_stats(engine: AsyncEngine) -> PoolStats:
+    pool = engine.pool
+    if not isinstance(pool, MonitoredQueuePool):
+        return PoolStats(
+            size=1, max_overflow=0, checked_out=0, checked_in=0, overflow=0,
+            checkouts=0, timeouts=0, wait_seconds_total=0.0, wait_seconds_max=0.0,
+        )
+
+    return PoolStats(
+        size=pool.size(),
+        max_overflow=settings.db_max_overflow,
+        checked_out=pool.checkedout(),
+        checked_in=pool.checkedin(),
+        # overflow() es negativo mientras el pool no se ha llenado
+        overflow=max(pool.overflow(), 0),
+        checkouts=pool.checkouts,
+        timeouts=pool.timeouts,
+        wait_seconds_total=pool.wait_seconds_total,
+        wait_seconds_max=pool.wait_seconds_max,
+    )
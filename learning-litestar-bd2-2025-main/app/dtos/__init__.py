@@ -1 +1,78 @@
 """Data Transfer Objects for API requests and responses."""
+
+from collections.abc import Iterator, Mapping
+from dataclasses import is_dataclass, replace
+from typing import Any, Generator, TypeVar
+
+from advanced_alchemy.extensions.litestar import SQLAlchemyDTO
+from litestar.dto.data_structures import DTOFieldDefinition
+from litestar.types.serialization import LitestarEncodableType
+from msgspec import UNSET
+from sqlalchemy import inspect
+from sqlalchemy.orm import DeclarativeBase
+
+T = TypeVar("T", bound=DeclarativeBase)
+
+
+class LoadedAttributes(Mapping[str, Any]):
+    """Read-only mapping of the attributes of a model instance that were loaded.
+
+    Serializing an unloaded relationship or deferred column would otherwise
+    trigger one lazy-load query per row (and fails outright under asyncio).
+    The DTO backend checks mappings with ``in`` and ``KeyError`` instead of
+    ``hasattr``, which would itself touch the unloaded attribute.
+    """
+
+    __slots__ = ("instance", "unloaded")
+
+    def __init__(self, instance: DeclarativeBase) -> None:
+        self.instance = instance
+        self.unloaded = inspect(instance).unloaded
+
+    def __getitem__(self, name: str) -> Any:
+        if name in self.unloaded:
+            raise KeyError(name)
+        try:
+            return loaded_view(getattr(self.instance, name))
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __contains__(self, name: object) -> bool:
+        return name not in self.unloaded and hasattr(type(self.instance), name)  # type: ignore[arg-type]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(inspect(self.instance).dict)
+
+    def __len__(self) -> int:
+        return len(inspect(self.instance).dict)
+
+
+def loaded_view(value: Any) -> Any:
+    """Wrap model instances (alone or in a list) in :class:`LoadedAttributes`."""
+    if isinstance(value, DeclarativeBase):
+        return LoadedAttributes(value)
+    if isinstance(value, list):
+        return [loaded_view(item) for item in value]
+    return value
+
+
+class LoadedAttributesDTO(SQLAlchemyDTO[T]):
+    """Read DTO that only serializes the attributes the query loaded.
+
+    Every field defaults to ``UNSET``, so relationships are left out of the
+    response unless the repository loaded them (e.g. through ``?expand=``),
+    and columns unless they were selected (all of them, or ``?fields=``).
+    """
+
+    @classmethod
+    def generate_field_definitions(cls, model_type: type[DeclarativeBase]) -> Generator[DTOFieldDefinition, None, None]:
+        for field_definition in super().generate_field_definitions(model_type):
+            yield replace(field_definition, default=UNSET)
+
+    def data_to_encodable_type(self, data: Any) -> LitestarEncodableType:
+        # CursorPage y FacetedPage llevan las filas en items
+        if is_dataclass(data) and not isinstance(data, type) and hasattr(data, "items"):
+            data = replace(data, items=loaded_view(data.items))
+        else:
+            data = loaded_view(data)
+        return super().data_to_encodable_type(data)
@@ -2,6 +2,7 @@
 
 from advanced_alchemy.extensions.litestar import SQLAlchemyDTO, SQLAlchemyDTOConfig
 
+from app.dtos import LoadedAttributesDTO
 from app.models import Book
 
 #importaciones obtenidas por chatgpt para solucionar errores mios
@@ -9,8 +10,8 @@ from typing import Optional, List
 from pydantic import BaseModel
 
 
-class BookReadDTO(SQLAlchemyDTO[Book]):
-    """DTO for reading book data."""
+class BookReadDTO(LoadedAttributesDTO[Book]):
+    """DTO for reading book data; relationships only with ``?expand=``."""
 
     config = SQLAlchemyDTOConfig()
 
@@ -27,6 +28,8 @@ class BookCreateDTO(SQLAlchemyDTO[Book]):
             "loans",
             "reviews",
             "categories",
+            "review_count",
+            "avg_rating",
         }
     )
     categories: Optional[List[CategoryInput]] = None
@@ -36,6 +39,6 @@ class BookUpdateDTO(SQLAlchemyDTO[Book]):
     """DTO for updating books with partial data."""
 
     config = SQLAlchemyDTOConfig(
-        exclude={"id", "created_at", "updated_at", "loans"},
+        exclude={"id", "created_at", "updated_at", "loans", "review_count", "avg_rating"},
         partial=True,
     )
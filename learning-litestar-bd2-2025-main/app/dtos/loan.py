@@ -2,11 +2,15 @@
 
 from advanced_alchemy.extensions.litestar import SQLAlchemyDTO, SQLAlchemyDTOConfig
 
+from app.dtos import LoadedAttributesDTO
 from app.models import Loan
 
 
-class LoanReadDTO(SQLAlchemyDTO[Loan]):
-    config = SQLAlchemyDTOConfig()
+class LoanReadDTO(LoadedAttributesDTO[Loan]):
+    # user y book solo se incluyen si se pidieron con ?expand=
+    config = SQLAlchemyDTOConfig(
+        exclude={"user.password"},
+    )
 
 
 class LoanCreateDTO(SQLAlchemyDTO[Loan]):
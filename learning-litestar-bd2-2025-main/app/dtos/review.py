@@ -6,7 +6,15 @@ from app.models import Review
 
 class ReviewReadDTO(SQLAlchemyDTO[Review]):
     config = SQLAlchemyDTOConfig(
-        exclude={"user_id", "book_id", "created_at", "updated_at"},
+        exclude={
+            "user_id",
+            "book_id",
+            "created_at",
+            "updated_at",
+            "user.password",
+            "book.review_count",
+            "book.avg_rating",
+        },
     )
 
 
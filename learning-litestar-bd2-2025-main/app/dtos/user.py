@@ -2,10 +2,11 @@
 
 from advanced_alchemy.extensions.litestar import SQLAlchemyDTO, SQLAlchemyDTOConfig
 
+from app.dtos import LoadedAttributesDTO
 from app.models import User
 
 
-class UserReadDTO(SQLAlchemyDTO[User]):
+class UserReadDTO(LoadedAttributesDTO[User]):
     """DTO for reading user data without password."""
 
     config = SQLAlchemyDTOConfig(exclude={"admin", "password", "loans"},
@@ -0,0 +1,438 @@
+"""In-memory bitmap index of the catalogue facets."""
+
+import heapq
+import re
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Any, Iterable, Iterator, Literal, Sequence
+
+from sqlalchemy import Row, event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.indexes import BackgroundIndex, BookIndex
+from app.models import Book, FacetCount
+from app.repositories.pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor
+
+Facet = Literal["language", "publisher", "published_year", "category", "available"]
+FACETS: tuple[Facet, ...] = ("language", "publisher", "published_year", "category", "available")
+CategoryMode = Literal["and", "or"]
+
+# Facetas con miles de valores: un bitmap por valor ocuparía ~125 KB por
+# editorial con un millón de libros, así que guardan listas ordenadas de ids
+# y solo sus valores más frecuentes tienen bitmap
+LIST_FACETS: tuple[Facet, ...] = ("publisher",)
+
+BOOK_COLUMNS = (Book.id, Book.language, Book.publisher, Book.published_year, Book.stock)
+
+# Un AND + bit_count cuesta ~1 ns por byte del bitmap y contar un libro
+# recorriendo el conjunto ~0.4 µs: por debajo de esta razón conviene recorrer
+SCAN_BYTES_PER_MEMBER = 400
+
+# Cambios de disponibilidad pendientes hasta el commit de la sesión
+PENDING_AVAILABILITY = "book_facets_availability"
+
+NONZERO_BYTE = re.compile(rb"[^\x00]")
+
+
+def _members(bitmap: int) -> Iterator[int]:
+    """Set bits of ``bitmap`` (book ids), in ascending order."""
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    for match in NONZERO_BYTE.finditer(data):
+        base = match.start() * 8
+        byte = data[match.start()]
+        while byte:
+            lowest = byte & -byte
+            yield base + lowest.bit_length() - 1
+            byte ^= lowest
+
+
+def _bitmap(book_ids: Iterable[int]) -> int:
+    """A bitmap with the bits of ``book_ids`` set, built in one pass."""
+    data = bytearray()
+    for book_id in book_ids:
+        byte = book_id >> 3
+        if byte >= len(data):
+            data.extend(bytes(byte + 1 - len(data)))
+        data[byte] |= 1 << (book_id & 7)
+    return int.from_bytes(data, "little")
+
+
+def _count_set(data: bytes, book_ids: array) -> int:
+    """How many of the sorted ``book_ids`` have their bit set in the little-endian ``data``."""
+    book_ids = book_ids[:bisect_left(book_ids, len(data) * 8)]
+    return sum(data[book_id >> 3] >> (book_id & 7) & 1 for book_id in book_ids)
+
+
+def year_bucket(published_year: int) -> int:
+    """First year of the bucket of ``published_year`` (1994 -> 1990 with buckets of 10)."""
+    return published_year // settings.facet_year_bucket_size * settings.facet_year_bucket_size
+
+
+class FacetIndex(BookIndex):
+    """Bitmaps of the books that have each facet value.
+
+    Bit ``n`` of a bitmap stands for the book with id ``n``, so filters are
+    ANDs and ORs of Python ints and counts are ``bit_count()`` calls, all
+    done in C. Counts over the whole catalogue are kept up to date on every
+    change, so the unfiltered page needs no bitmap operation at all; small
+    filtered sets are counted by walking their books instead.
+
+    The facets of :data:`LIST_FACETS` (publishers) have too many values for
+    a bitmap each: every value keeps a sorted array of its ids, and only the
+    ``top_values`` values with the most books also keep a bitmap. Over a
+    large filtered set the other values are counted through their ids, from
+    the most frequent down, until the rest can't reach the returned ones.
+
+    As usual in faceted search, the counts of a facet ignore the filter on
+    that same facet (they tell how many books each alternative would
+    match), except for categories combined with AND, which narrow down.
+    """
+
+    columns = BOOK_COLUMNS
+
+    def __init__(self, top_values: int = 50) -> None:
+        super().__init__()
+        self.top_values = top_values
+        self._all = 0
+        self._bitmaps: dict[Facet, dict[Any, int]] = {facet: {} for facet in FACETS}
+        self._ids: dict[Facet, dict[Any, array]] = {facet: {} for facet in LIST_FACETS}
+        self._counts: dict[Facet, Counter[Any]] = {facet: Counter() for facet in FACETS}
+        # Valores actuales de cada libro, en el orden de FACETS
+        self._books: dict[int, tuple[Any, ...]] = {}
+        # Libros leídos por la construcción inicial, indexados juntos en finish_load
+        self._loading: list[tuple[int, tuple[Any, ...]]] = []
+
+    def __len__(self) -> int:
+        return len(self._books)
+
+    def empty(self) -> "FacetIndex":
+        return FacetIndex(top_values=self.top_values)
+
+    def add_rows(self, rows: Sequence[Row[Any]], categories: dict[int, list[int]]) -> None:
+        for row in rows:
+            self.add(row.id, _book_values(row, categories.get(row.id, ())))
+
+    def load_rows(self, rows: Sequence[Row[Any]], categories: dict[int, list[int]]) -> None:
+        # add() copia bitmaps enteros por libro: se juntan y se arman de una vez
+        self._loading.extend((row.id, _book_values(row, categories.get(row.id, ()))) for row in rows)
+
+    def finish_load(self) -> None:
+        self.load(self._loading)
+        self._loading = []
+
+    @staticmethod
+    def _values(values: tuple[Any, ...]) -> Iterator[tuple[Facet, Any]]:
+        for facet, value in zip(FACETS, values):
+            if facet == "category":
+                yield from ((facet, category_id) for category_id in value)
+            elif value is not None:
+                yield facet, value
+
+    def load(self, books: Iterable[tuple[int, tuple[Any, ...]]]) -> None:
+        """Replace the whole index, building every bitmap in a single pass."""
+        self._books = dict(books)
+        members: dict[Facet, dict[Any, list[int]]] = {facet: {} for facet in FACETS}
+        for book_id, values in self._books.items():
+            for facet, value in self._values(values):
+                members[facet].setdefault(value, []).append(book_id)
+
+        self._all = _bitmap(self._books)
+        self._counts = {
+            facet: Counter({value: len(book_ids) for value, book_ids in values.items()})
+            for facet, values in members.items()
+        }
+        self._ids = {
+            facet: {value: array("I", sorted(book_ids)) for value, book_ids in members[facet].items()}
+            for facet in LIST_FACETS
+        }
+        self._bitmaps = {}
+        for facet, values in members.items():
+            if facet in LIST_FACETS:
+                top = {value for value, _ in self._counts[facet].most_common(self.top_values)}
+                values = {value: book_ids for value, book_ids in values.items() if value in top}
+            self._bitmaps[facet] = {value: _bitmap(book_ids) for value, book_ids in values.items()}
+
+    def remove(self, book_id: int) -> None:
+        """Drop a book from the index, if it is there."""
+        values = self._books.pop(book_id, None)
+        if values is None:
+            return
+        bit = 1 << book_id
+        self._all &= ~bit
+        for facet, value in self._values(values):
+            bitmaps = self._bitmaps[facet]
+            if value in bitmaps:
+                bitmaps[value] &= ~bit
+            if facet in LIST_FACETS:
+                book_ids = self._ids[facet][value]
+                del book_ids[bisect_left(book_ids, book_id)]
+            self._counts[facet][value] -= 1
+            if not self._counts[facet][value]:
+                del self._counts[facet][value]
+                bitmaps.pop(value, None)
+                if facet in LIST_FACETS:
+                    del self._ids[facet][value]
+
+    def add(self, book_id: int, values: tuple[Any, ...]) -> None:
+        """Index a book with its values in the order of ``FACETS``, replacing the previous ones."""
+        self.remove(book_id)
+        bit = 1 << book_id
+        self._books[book_id] = values
+        self._all |= bit
+        for facet, value in self._values(values):
+            bitmaps = self._bitmaps[facet]
+            self._counts[facet][value] += 1
+            if facet in LIST_FACETS:
+                insort(self._ids[facet].setdefault(value, array("I")), book_id)
+                if value not in bitmaps and not self._promote(facet, value):
+                    continue
+            bitmaps[value] = bitmaps.get(value, 0) | bit
+
+    def _promote(self, facet: Facet, value: Any) -> bool:
+        """Give ``value`` a bitmap if it now has more books than a value that has one."""
+        bitmaps = self._bitmaps[facet]
+        counts = self._counts[facet]
+        if len(bitmaps) >= self.top_values:
+            smallest = min(bitmaps, key=counts.__getitem__)
+            if counts[value] <= counts[smallest]:
+                return False
+            del bitmaps[smallest]
+        bitmaps[value] = _bitmap(self._ids[facet][value])
+        return True
+
+    def _value_bitmap(self, facet: Facet, value: Any) -> int:
+        bitmap = self._bitmaps[facet].get(value)
+        if bitmap is None and facet in LIST_FACETS:
+            # Editorial poco frecuente: armar el bitmap desde su lista de ids
+            bitmap = _bitmap(self._ids[facet].get(value, ()))
+        return bitmap or 0
+
+    def set_available(self, book_id: int, available: bool) -> None:
+        """Move a book between the available and unavailable sets after a stock change."""
+        values = self._books.get(book_id)
+        if values is not None and values[-1] != available:
+            self.add(book_id, (*values[:-1], available))
+
+    def remove_value(self, facet: Facet, value: Any) -> None:
+        """Drop a value from every book, e.g. a deleted category."""
+        for book_id in list(_members(self._value_bitmap(facet, value))):
+            values = dict(zip(FACETS, self._books[book_id]))
+            if facet == "category":
+                values[facet] = tuple(item for item in values[facet] if item != value)
+            else:
+                values[facet] = None
+            self.add(book_id, tuple(values.values()))
+
+    def _filter(self, facet: Facet, selected: Sequence[Any], mode: CategoryMode) -> int:
+        bitmaps = [self._value_bitmap(facet, value) for value in selected]
+        result = bitmaps[0]
+        for bitmap in bitmaps[1:]:
+            result = result & bitmap if mode == "and" else result | bitmap
+        return result
+
+    def _count(self, facets: list[Facet], base: int | None, facet_limit: int) -> dict[Facet, Counter[Any]]:
+        """
+        Counts of the values of ``facets`` among the books of ``base`` (all if None).
+
+        Values left out can't be among the ``facet_limit`` with the most books.
+        """
+        if base is None:
+            return {facet: self._counts[facet] for facet in facets}
+
+        values = sum(len(self._bitmaps[facet]) for facet in facets)
+        if base.bit_count() * SCAN_BYTES_PER_MEMBER < values * (self._all.bit_length() // 8):
+            counts: dict[Facet, Counter[Any]] = {facet: Counter() for facet in facets}
+            positions = [(facet, FACETS.index(facet)) for facet in facets]
+            for book_id in _members(base):
+                book = self._books[book_id]
+                for facet, position in positions:
+                    if facet == "category":
+                        counts[facet].update(book[position])
+                    elif book[position] is not None:
+                        counts[facet][book[position]] += 1
+            return counts
+
+        counts = {
+            facet: Counter({
+                value: count
+                for value, bitmap in self._bitmaps[facet].items()
+                if (count := (base & bitmap).bit_count())
+            })
+            for facet in facets
+        }
+        # Editoriales sin bitmap: se cuentan revisando sus ids, de más a menos
+        # libros, mientras su total aún alcance a las facet_limit primeras
+        data = None
+        for facet in facets:
+            if facet not in LIST_FACETS:
+                continue
+            top = heapq.nlargest(facet_limit, counts[facet].values())
+            heapq.heapify(top)
+            for value, total in self._counts[facet].most_common():
+                if len(top) == facet_limit and total < top[0]:
+                    break
+                if value in self._bitmaps[facet]:
+                    continue
+                if data is None:
+                    data = base.to_bytes((base.bit_length() + 7) // 8, "little")
+                count = _count_set(data, self._ids[facet][value])
+                if count:
+                    counts[facet][value] = count
+                    if len(top) < facet_limit:
+                        heapq.heappush(top, count)
+                    elif count > top[0]:
+                        heapq.heapreplace(top, count)
+        return counts
+
+    def search(
+        self,
+        selected: dict[Facet, Sequence[Any]],
+        category_mode: CategoryMode = "or",
+        facet_limit: int = 20,
+    ) -> tuple[int, dict[Facet, list[FacetCount]]]:
+        """
+        Bitmap of the books matching ``selected`` and the counts of every facet.
+
+        Values of one facet are combined with OR (categories with
+        ``category_mode``) and different facets with AND. Each facet returns
+        its ``facet_limit`` values with the most books, ties by value, so
+        the result doesn't depend on how the counts were computed.
+        """
+        filters = {
+            facet: self._filter(facet, values, category_mode if facet == "category" else "or")
+            for facet, values in selected.items()
+            if values
+        }
+
+        def matching(excluded: Facet | None) -> int | None:
+            bitmaps = [bitmap for facet, bitmap in filters.items() if facet != excluded]
+            if not bitmaps:
+                return None
+            result = bitmaps[0]
+            for bitmap in bitmaps[1:]:
+                result &= bitmap
+            return result
+
+        # Las facetas sin filtro propio comparten el mismo conjunto de libros
+        groups: dict[Facet | None, list[Facet]] = {}
+        for facet in FACETS:
+            narrows = facet == "category" and category_mode == "and"
+            groups.setdefault(facet if facet in filters and not narrows else None, []).append(facet)
+
+        result = matching(None)
+        counts: dict[Facet, Counter[Any]] = {}
+        for excluded, facets in groups.items():
+            counts.update(self._count(facets, result if excluded is None else matching(excluded), facet_limit))
+
+        return (
+            self._all if result is None else result,
+            {
+                facet: [
+                    FacetCount(value=value, count=count)
+                    for value, count in heapq.nsmallest(
+                        facet_limit, counts[facet].items(), key=lambda item: (-item[1], item[0])
+                    )
+                ]
+                for facet in FACETS
+            },
+        )
+
+
+book_facets = FacetIndex(top_values=settings.facet_top_values)
+book_facets_builder = BackgroundIndex(
+    "facetas",
+    book_facets,
+    enabled=settings.book_facets_enabled,
+    batch_size=settings.facet_batch_size,
+)
+
+
+def page_ids(result: int, cursor: str | None, limit: int) -> tuple[list[int], str | None, str | None]:
+    """
+    Ids of one page of ``result`` in id order, and the next/prev cursors.
+
+    Cursors have the same format as :meth:`KeysetPaginationMixin.list_page`.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    direction = "next"
+    if cursor is not None:
+        direction, (position,) = decode_cursor(cursor, [Book.id])
+        if direction == "next":
+            result = result >> (position + 1) << (position + 1)
+        else:
+            result &= (1 << position) - 1
+
+    ids = []
+    if direction == "next":
+        for book_id in _members(result):
+            ids.append(book_id)
+            if len(ids) > limit:
+                break
+    else:
+        # Los ids más altos por debajo del cursor
+        while result and len(ids) <= limit:
+            book_id = result.bit_length() - 1
+            ids.append(book_id)
+            result ^= 1 << book_id
+
+    has_more = len(ids) > limit
+    ids = ids[:limit]
+    if direction == "prev":
+        ids.reverse()
+
+    next_cursor = prev_cursor = None
+    if ids:
+        if direction == "prev" or has_more:
+            next_cursor = encode_cursor("next", (ids[-1],))
+        if cursor is not None and (direction == "next" or has_more):
+            prev_cursor = encode_cursor("prev", (ids[0],))
+    return ids, next_cursor, prev_cursor
+
+
+def _book_values(row: Any, categories: Sequence[int]) -> tuple[Any, ...]:
+    return (
+        row.language,
+        row.publisher,
+        year_bucket(row.published_year),
+        tuple(sorted(set(categories))),
+        row.stock > 0,
+    )
+
+
+async def refresh_book_facets(session: AsyncSession, book_ids: Iterable[int]) -> None:
+    """Re-read ``book_ids`` from the database and reindex them; missing books are removed."""
+    await book_facets_builder.refresh(session, book_ids)
+
+
+def remove_category(category_id: int) -> None:
+    """Drop a deleted category from every book of the index."""
+    book_facets_builder.apply(lambda index: index.remove_value("category", category_id))
+
+
+def stage_availability(session: AsyncSession, books: Iterable[Book]) -> None:
+    """Record stock changes, applied to the index only once ``session`` commits."""
+    session.info.setdefault(PENDING_AVAILABILITY, {}).update(
+        {book.id: book.stock > 0 for book in books}
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    pending = session.info.pop(PENDING_AVAILABILITY, {})
+    if not pending:
+        return
+
+    def set_available(index: FacetIndex) -> None:
+        for book_id, available in pending.items():
+            index.set_available(book_id, available)
+
+    book_facets_builder.apply(set_available)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    session.info.pop(PENDING_AVAILABILITY, None)
+
@@ -0,0 +1,267 @@
+"""In-memory indexes of the catalogue, built in the background by each worker."""
+
+import asyncio
+import logging
+import time
+from contextlib import suppress
+from typing import Any, AsyncIterator, Callable, ClassVar, Generic, Iterable, Self, Sequence, TypeVar
+
+import anyio.to_thread
+from litestar import Litestar
+from sqlalchemy import ColumnElement, Row, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+from app.db import sqlalchemy_config
+from app.models import Book, BookCategory
+
+logger = logging.getLogger(__name__)
+
+
+class BookIndex:
+    """Base of the in-memory indexes of the books.
+
+    An index reads ``columns`` of each book (``Book.id`` first) plus its
+    category ids. A new copy is filled with :meth:`load_rows` and
+    :meth:`finish_load` in a worker thread, where nothing else touches it,
+    and the live copy then takes over its contents with :meth:`replace`.
+    """
+
+    columns: ClassVar[tuple[InstrumentedAttribute[Any], ...]]
+
+    def __init__(self) -> None:
+        self.ready = False
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def empty(self) -> Self:
+        """A new, empty index with the same settings."""
+        raise NotImplementedError
+
+    def add_rows(self, rows: Sequence[Row[Any]], categories: dict[int, list[int]]) -> None:
+        """Index a batch of rows, replacing the previous version of each book."""
+        raise NotImplementedError
+
+    def remove(self, book_id: int) -> None:
+        """Drop a book from the index, if it is there."""
+        raise NotImplementedError
+
+    def load_rows(self, rows: Sequence[Row[Any]], categories: dict[int, list[int]]) -> None:
+        """Add a batch of the initial build; by default the same as :meth:`add_rows`."""
+        self.add_rows(rows, categories)
+
+    def finish_load(self) -> None:
+        """Finish the initial build, once every batch was loaded."""
+
+    @property
+    def needs_compaction(self) -> bool:
+        """Whether the index should be rebuilt with :meth:`compact`."""
+        return False
+
+    def copy(self) -> Self:
+        """A copy to compact in a worker thread; cheap, since it runs on the event loop."""
+        raise NotImplementedError
+
+    def compact(self) -> None:
+        """Rebuild the index from its own contents."""
+        raise NotImplementedError
+
+    def replace(self, other: Self) -> None:
+        """Take over the contents of ``other``, an index built in the background."""
+        self.__dict__.update(other.__dict__)
+
+
+IndexT = TypeVar("IndexT", bound=BookIndex)
+
+# Se construyen uno tras otro, en el orden en que se registran: app.facets
+# se importa antes (desde los repositorios) y las facetas tardan menos
+INDEXES: list["BackgroundIndex[Any]"] = []
+
+
+async def book_categories(session: AsyncSession, condition: ColumnElement[bool]) -> dict[int, list[int]]:
+    """Category ids of the books whose ``book_categories`` rows match ``condition``."""
+    categories: dict[int, list[int]] = {}
+    result = await session.execute(select(BookCategory.book_id, BookCategory.category_id).where(condition))
+    for book_id, category_id in result:
+        categories.setdefault(book_id, []).append(category_id)
+    return categories
+
+
+async def book_batches(
+    columns: Sequence[InstrumentedAttribute[Any]],
+    batch_size: int,
+) -> AsyncIterator[tuple[Sequence[Row[Any]], dict[int, list[int]]]]:
+    """``columns`` of every book and its category ids, in batches by id."""
+    last_id = 0
+    while True:
+        # Una transacción corta por lote: la construcción no retiene conexiones
+        async with sqlalchemy_config.get_session() as session:
+            rows = (await session.execute(
+                select(*columns)
+                .where(Book.id > last_id)
+                .order_by(Book.id)
+                .limit(batch_size)
+            )).all()
+            if not rows:
+                return
+            # Por rango de ids: un IN con todo el lote excede los parámetros de SQLite antiguo
+            categories = await book_categories(session, BookCategory.book_id.between(rows[0].id, rows[-1].id))
+        yield rows, categories
+        last_id = rows[-1].id
+
+
+async def _reindex(index: BookIndex, session: AsyncSession, book_ids: set[int]) -> None:
+    """Re-read ``book_ids`` into ``index``; the ones no longer in the database are removed."""
+    rows = (await session.execute(select(*index.columns).where(Book.id.in_(book_ids)))).all()
+    index.add_rows(rows, await book_categories(session, BookCategory.book_id.in_([row.id for row in rows])))
+    for book_id in book_ids - {row.id for row in rows}:
+        index.remove(book_id)
+
+
+class BackgroundIndex(Generic[IndexT]):
+    """The live copy of an index and the build that replaces it in the background.
+
+    A new copy is built for the initial build and, from a copy of the live
+    one, when the live copy needs compaction. Meanwhile changes are also
+    recorded: books to re-read from the database and in-memory operations.
+    They are applied to the new copy before it is swapped in, so none is
+    lost in between.
+    """
+
+    def __init__(self, name: str, index: IndexT, *, enabled: bool, batch_size: int) -> None:
+        self.name = name
+        self.index = index
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.building = False
+        self._changed: set[int] = set()
+        self._operations: list[Callable[[IndexT], None]] = []
+        self._tasks: set[asyncio.Task[None]] = set()
+        INDEXES.append(self)
+
+    async def refresh(self, session: AsyncSession, book_ids: Iterable[int]) -> None:
+        """Re-read ``book_ids`` from the database and reindex them; missing books are removed."""
+        book_ids = set(book_ids)
+        if not self.enabled or not book_ids:
+            return
+        if self.index.ready:
+            await _reindex(self.index, session, book_ids)
+        # Después de leer: una compactación pudo empezar mientras tanto
+        if self.building:
+            self._changed.update(book_ids)
+        self._compact_if_needed()
+
+    def apply(self, operation: Callable[[IndexT], None]) -> None:
+        """Run an in-memory change on the live copy, and later on the one being built."""
+        if not self.enabled:
+            return
+        if self.building:
+            self._operations.append(operation)
+        if self.index.ready:
+            operation(self.index)
+        self._compact_if_needed()
+
+    async def build(self) -> None:
+        """
+        Index the whole catalogue into a new copy and swap it in when done.
+
+        Books are read by id in batches, each in its own short transaction,
+        and indexed in a worker thread so the event loop keeps serving
+        requests.
+        """
+        if not self.enabled:
+            return
+
+        start = time.perf_counter()
+        self.building = True
+        try:
+            index = self.index.empty()
+            async for rows, categories in book_batches(index.columns, self.batch_size):
+                await anyio.to_thread.run_sync(index.load_rows, rows, categories)
+            await anyio.to_thread.run_sync(index.finish_load)
+            await self._swap(index)
+        finally:
+            self._stop_recording()
+        logger.info("Índice de %s: %d libros en %.1f s", self.name, len(self.index), time.perf_counter() - start)
+
+    def _compact_if_needed(self) -> None:
+        if self.building or not self.index.ready or not self.index.needs_compaction:
+            return
+        # La copia se toma sin await de por medio: todo cambio posterior queda registrado
+        self.building = True
+        task = asyncio.create_task(self._compact(self.index.copy()))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _compact(self, index: IndexT) -> None:
+        """Compact ``index``, a copy of the live one, in a worker thread and swap it in."""
+        start = time.perf_counter()
+        try:
+            await anyio.to_thread.run_sync(index.compact)
+            await self._swap(index)
+            logger.info(
+                "Índice de %s compactado: %d libros en %.1f s",
+                self.name,
+                len(self.index),
+                time.perf_counter() - start,
+            )
+        except Exception:
+            logger.exception("No se pudo compactar el índice de %s", self.name)
+        finally:
+            self._stop_recording()
+
+    async def stop(self) -> None:
+        """Cancel a compaction that is still running."""
+        for task in list(self._tasks):
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+    async def _swap(self, index: IndexT) -> None:
+        """Apply the changes recorded during the build to ``index`` and make it the live copy."""
+        while self._operations or self._changed:
+            operations, self._operations = self._operations, []
+            for operation in operations:
+                operation(index)
+            changed, self._changed = self._changed, set()
+            if changed:
+                async with sqlalchemy_config.get_session() as session:
+                    await _reindex(index, session, changed)
+
+        self.index.replace(index)
+        self.index.ready = True
+
+    def _stop_recording(self) -> None:
+        self.building = False
+        self._changed.clear()
+        self._operations.clear()
+
+
+async def _build_indexes(app: Litestar) -> None:
+    for index in INDEXES:
+        try:
+            await index.build()
+        except Exception:
+            logger.exception("No se pudo construir el índice de %s", index.name)
+
+
+def start_index_build(app: Litestar) -> None:
+    """
+    Build the in-memory indexes in a background task.
+
+    The worker serves requests meanwhile; endpoints that need an index
+    answer 503 until its ``ready`` flag is set.
+    """
+    app.state.index_build = asyncio.create_task(_build_indexes(app))
+
+
+async def stop_index_build(app: Litestar) -> None:
+    """Cancel the build and the compactions that are still running."""
+    task: asyncio.Task[None] | None = app.state.get("index_build")
+    if task is not None and not task.done():
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    for index in INDEXES:
+        await index.stop()
@@ -0,0 +1,232 @@
+"""Prometheus-style metrics of HTTP requests and database queries."""
+
+import logging
+import time
+from bisect import bisect_left
+from collections.abc import Iterator
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from litestar.enums import ScopeType
+from litestar.middleware import ASGIMiddleware
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.db import pool_stats
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Las demás sentencias (SAVEPOINT, PRAGMA, ...) se cuentan como OTHER
+OPERATIONS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"})
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], **extra: str) -> str:
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """A counter or gauge with labels, rendered in the Prometheus text format."""
+
+    def __init__(self, name: str, description: str, labelnames: tuple[str, ...] = (), kind: str = "counter") -> None:
+        self.name = name
+        self.description = description
+        self.labelnames = labelnames
+        self.kind = kind
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.description}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram(Metric):
+    """A histogram with cumulative buckets, rendered in the Prometheus text format."""
+
+    def __init__(self, name: str, description: str, labelnames: tuple[str, ...], buckets: tuple[float, ...]) -> None:
+        super().__init__(name, description, labelnames, kind="histogram")
+        self.buckets = buckets
+        self.observations: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        # counts[i] cuenta las observaciones <= buckets[i]; la última es +Inf
+        counts, total = self.observations.setdefault(labels, ([0] * (len(self.buckets) + 1), [0.0]))
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.description}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, (counts, total) in sorted(self.observations.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le=le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total[0])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+requests_total = Metric(
+    "http_requests_total", "HTTP requests by route and status code.", ("method", "route", "status"),
+)
+requests_in_flight = Metric(
+    "http_requests_in_flight", "HTTP requests being served.", ("method", "route"), kind="gauge",
+)
+request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route"), LATENCY_BUCKETS,
+)
+request_queries = Histogram(
+    "http_request_queries", "Database queries per HTTP request.", ("method", "route"), QUERY_COUNT_BUCKETS,
+)
+request_query_seconds = Metric(
+    "http_request_query_seconds_total", "Time spent in database queries by route.", ("method", "route"),
+)
+query_threshold_exceeded = Metric(
+    "http_request_query_threshold_exceeded_total",
+    "HTTP requests that ran more queries than METRICS_QUERY_THRESHOLD.",
+    ("method", "route"),
+)
+query_duration = Histogram(
+    "db_query_duration_seconds", "Database statement latency.", ("operation",), QUERY_LATENCY_BUCKETS,
+)
+
+METRICS = (
+    requests_total,
+    requests_in_flight,
+    request_duration,
+    request_queries,
+    request_query_seconds,
+    query_threshold_exceeded,
+    query_duration,
+)
+
+
+@dataclass
+class RequestQueries:
+    """Queries run while serving the current request."""
+
+    method: str
+    route: str
+    count: int = 0
+    seconds: float = 0.0
+
+
+# Un objeto mutable: las tareas hijas (dependencias) suman sobre el mismo
+request_queries_var: ContextVar[RequestQueries | None] = ContextVar("request_queries", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    query_duration.observe(elapsed, operation if operation in OPERATIONS else "OTHER")
+
+    queries = request_queries_var.get()
+    if queries is not None:
+        queries.count += 1
+        queries.seconds += elapsed
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context) -> None:
+    # after_cursor_execute no se llama si la sentencia falla
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start"):
+        connection.info["query_start"].pop()
+
+
+class MetricsMiddleware(ASGIMiddleware):
+    """Record latency, in-flight requests, status codes and queries per route.
+
+    Routes are labelled with their path template (``/books/{book_id:int}``),
+    so the number of series does not grow with the ids in the URLs.
+    Requests that run more than ``metrics_query_threshold`` queries are
+    counted and logged, to spot N+1 patterns.
+    """
+
+    scopes = (ScopeType.HTTP,)
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send, next_app: ASGIApp) -> None:
+        method = scope["method"]
+        route = scope.get("path_template", "unmatched")
+        status = 500
+        queries = RequestQueries(method, route)
+        token = request_queries_var.set(queries)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        requests_in_flight.inc(method, route)
+        start = time.perf_counter()
+        try:
+            await next_app(scope, receive, send_wrapper)
+        finally:
+            request_duration.observe(time.perf_counter() - start, method, route)
+            requests_in_flight.dec(method, route)
+            requests_total.inc(method, route, str(status))
+            request_queries.observe(queries.count, method, route)
+            request_query_seconds.inc(method, route, amount=queries.seconds)
+            request_queries_var.reset(token)
+
+            threshold = settings.metrics_query_threshold
+            if threshold is not None and queries.count > threshold:
+                query_threshold_exceeded.inc(method, route)
+                logger.warning(
+                    "%s %s ejecutó %d consultas (umbral %d, %.1f ms en la base de datos)",
+                    method, scope["path"], queries.count, threshold, queries.seconds * 1000,
+                )
+
+
+POOL_METRICS = (
+    ("db_pool_size", "gauge", "size", "Connections kept in the pool."),
+    ("db_pool_checked_out", "gauge", "checked_out", "Connections in use."),
+    ("db_pool_overflow", "gauge", "overflow", "Connections opened beyond the pool size."),
+    ("db_pool_checkouts_total", "counter", "checkouts", "Connections handed out by the pool."),
+    ("db_pool_timeouts_total", "counter", "timeouts", "Checkouts that timed out waiting for a connection."),
+    ("db_pool_wait_seconds_total", "counter", "wait_seconds_total", "Time spent waiting for a connection."),
+)
+
+
+def render_metrics() -> str:
+    """Every metric of this worker in the Prometheus text exposition format."""
+    lines = [line for metric in METRICS for line in metric.render()]
+
+    stats = pool_stats()
+    pools = [("primary", stats), *((f"replica{index}", replica) for index, replica in enumerate(stats.replicas))]
+    for name, kind, field, description in POOL_METRICS:
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+        lines += [f'{name}{{pool="{pool}"}} {_number(getattr(pool_stat, field))}' for pool, pool_stat in pools]
+    return "\n".join(lines) + "\n"
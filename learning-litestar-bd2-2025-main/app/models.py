@@ -1,14 +1,17 @@
 """Database models for the library management system."""
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import date, datetime
 from decimal import Decimal
 from enum import Enum as PyEnum
+from typing import Generic, TypeVar
 
-from advanced_alchemy.base import BigIntAuditBase
-from sqlalchemy import ForeignKey, Enum as SAEnum, Numeric
+from advanced_alchemy.base import AdvancedDeclarativeBase, BigIntAuditBase
+from sqlalchemy import ForeignKey, Enum as SAEnum, Index, Numeric, UniqueConstraint, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+T = TypeVar("T")
+
 
 class User(BigIntAuditBase):
     """User model with audit fields."""
@@ -32,18 +35,45 @@ class Book(BigIntAuditBase):
     """Book model with audit fields."""
 
     __tablename__ = "books"
+    __table_args__ = tuple(
+        # Índices trigram para la búsqueda (solo PostgreSQL, requieren pg_trgm)
+        Index(
+            f"ix_books_{column}_trgm",
+            column,
+            postgresql_using="gin",
+            postgresql_ops={column: "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql")
+        for column in ("title", "author", "description")
+    ) + (
+        # Libros disponibles (get_available_books)
+        Index(
+            "ix_books_in_stock",
+            "id",
+            postgresql_where=text("stock > 0"),
+            sqlite_where=text("stock > 0"),
+        ),
+        # Paginación de /books/recent por (created_at, id)
+        Index("ix_books_created_at_id", "created_at", "id"),
+        # Rankings de /books/most-reviewed y /books/top-rated
+        Index("ix_books_review_count", "review_count"),
+        Index("ix_books_avg_rating_review_count", "avg_rating", "review_count"),
+    )
 
     title: Mapped[str] = mapped_column(unique=True)
     author: Mapped[str]
     isbn: Mapped[str] = mapped_column(unique=True)
     pages: Mapped[int]
-    published_year: Mapped[int]
+    published_year: Mapped[int] = mapped_column(index=True)
 
     stock: Mapped[int] = mapped_column(default=1)
     description: Mapped[str | None]
     language: Mapped[str]
     publisher: Mapped[str | None]
 
+    # Estadísticas de reseñas, mantenidas por BookRepository.refresh_review_stats
+    review_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    avg_rating: Mapped[Decimal | None] = mapped_column(Numeric(3, 2))
+
     loans: Mapped[list["Loan"]] = relationship(back_populates="book")
     categories: Mapped[list["BookCategory"]] = relationship(back_populates="book")
     reviews: Mapped[list["Review"]] = relationship(back_populates="book")
@@ -59,11 +89,15 @@ class Loan(BigIntAuditBase):
     """Loan model with audit fields."""
 
     __tablename__ = "loans"
+    __table_args__ = (
+        # Búsqueda de préstamos vencidos por estado y fecha
+        Index("ix_loans_status_due_date", "status", "due_date"),
+    )
 
     loan_dt: Mapped[date] = mapped_column(default=datetime.today)
     return_dt: Mapped[date | None]
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
-    book_id: Mapped[int] = mapped_column(ForeignKey("books.id"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    book_id: Mapped[int] = mapped_column(ForeignKey("books.id"), index=True)
 
     due_date: Mapped[date]
     fine_amount: Mapped[Decimal | None] = mapped_column(Numeric(10, 2))
@@ -95,9 +129,13 @@ class BookCategory(BigIntAuditBase):
     """Association table between books and categories."""
 
     __tablename__ = "book_categories"
+    __table_args__ = (
+        # También sirve como índice por book_id
+        UniqueConstraint("book_id", "category_id"),
+    )
 
     book_id: Mapped[int] = mapped_column(ForeignKey("books.id"))
-    category_id: Mapped[int] = mapped_column(ForeignKey("categories.id"))
+    category_id: Mapped[int] = mapped_column(ForeignKey("categories.id"), index=True)
 
     book: Mapped["Book"] = relationship(back_populates="categories")
     category: Mapped["Category"] = relationship(back_populates="books")
@@ -111,13 +149,32 @@ class Review(BigIntAuditBase):
     rating: Mapped[int]
     comment: Mapped[str]
     review_date: Mapped[date]
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
-    book_id: Mapped[int] = mapped_column(ForeignKey("books.id"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    book_id: Mapped[int] = mapped_column(ForeignKey("books.id"), index=True)
 
     user: Mapped["User"] = relationship(back_populates="reviews")
     book: Mapped["Book"] = relationship(back_populates="reviews")
 
 
+class BookCoBorrow(AdvancedDeclarativeBase):
+    """How many users borrowed both ``book_id`` and ``other_book_id``.
+
+    Precomputed item-item co-occurrence of the loans table, stored in both
+    directions. Maintained by ``LoanRepository.add_co_borrows`` and rebuilt
+    with ``litestar loans rebuild-co-borrows``.
+    """
+
+    __tablename__ = "book_co_borrows"
+    __table_args__ = (
+        # /books/{id}/also-borrowed: los más prestados en conjunto con un libro
+        Index("ix_book_co_borrows_ranking", "book_id", "borrowers", "other_book_id"),
+    )
+
+    book_id: Mapped[int] = mapped_column(ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    other_book_id: Mapped[int] = mapped_column(ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    borrowers: Mapped[int]
+
+
 @dataclass
 class PasswordUpdate:
     """Password update request."""
@@ -126,6 +183,52 @@ class PasswordUpdate:
     new_password: str
 
 
+@dataclass
+class LoanCheckout:
+    """Books lent to one user in a single checkout."""
+
+    user_id: int
+    book_ids: list[int]
+    loan_dt: date | None = None
+
+
+@dataclass
+class StockAdjustment:
+    """Stock change for one book in a bulk stock update."""
+
+    book_id: int
+    quantity: int
+
+
+@dataclass
+class BookImportError:
+    """A row of a bulk import that could not be loaded."""
+
+    line: int
+    detail: str
+
+
+@dataclass
+class BookImportResult:
+    """Summary of a bulk book import."""
+
+    processed: int = 0
+    imported: int = 0
+    failed: int = 0
+    errors: list[BookImportError] = field(default_factory=list)
+
+
+@dataclass
+class BookStatsGroup:
+    """Book statistics for a single language, publisher or category."""
+
+    key: str | None
+    total_books: int
+    average_pages: float
+    oldest_publication_year: int | None
+    newest_publication_year: int | None
+
+
 @dataclass
 class BookStats:
     """Book statistics data."""
@@ -134,3 +237,75 @@ class BookStats:
     average_pages: float
     oldest_publication_year: int | None
     newest_publication_year: int | None
+    by_language: list[BookStatsGroup] = field(default_factory=list)
+    by_publisher: list[BookStatsGroup] = field(default_factory=list)
+    by_category: list[BookStatsGroup] = field(default_factory=list)
+
+
+@dataclass
+class SimilarBook:
+    """A book similar in content to another one, with its cosine similarity."""
+
+    id: int
+    title: str
+    author: str
+    score: float
+
+
+@dataclass
+class FacetCount:
+    """How many books have one value of a facet."""
+
+    value: str | int | bool
+    count: int
+
+
+@dataclass
+class PoolStats:
+    """Live state and counters of the database connection pool."""
+
+    size: int
+    max_overflow: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    checkouts: int
+    timeouts: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+    replicas: list["PoolStats"] = field(default_factory=list)
+
+
+@dataclass
+class SlowQuery:
+    """A statement that took longer than the slow-query threshold."""
+
+    recorded_at: datetime
+    duration_ms: float
+    statement: str
+    parameters: str
+    method: str | None
+    route: str | None
+    plan: str | None = None
+
+
+@dataclass
+class CursorPage(Generic[T]):
+    """One page of a keyset-paginated listing."""
+
+    items: list[T]
+    limit: int
+    next_cursor: str | None
+    prev_cursor: str | None
+
+
+@dataclass
+class FacetedPage(Generic[T]):
+    """One page of a faceted search, with the facet counts of all its matches."""
+
+    items: list[T]
+    total: int
+    limit: int
+    next_cursor: str | None
+    prev_cursor: str | None
+    facets: dict[str, list[FacetCount]] = field(default_factory=dict)
@@ -0,0 +1,64 @@
+"""Password hashing executed outside the event loop."""
+
+from typing import Any, Callable, TypeVar
+
+import anyio.to_thread
+from anyio import CapacityLimiter
+from pwdlib import PasswordHash
+
+from app.config import settings
+
+T = TypeVar("T")
+
+
+class PasswordHasherBusyError(RuntimeError):
+    """Raised when too many hashing jobs are already waiting."""
+
+
+class PasswordHasher:
+    """Runs Argon2 hashing/verification in a bounded thread pool.
+
+    Argon2 releases the GIL, so ``max_workers`` threads hash in parallel while
+    the event loop keeps serving other requests. At most ``max_queue`` further
+    jobs may wait for a thread; beyond that :class:`PasswordHasherBusyError`
+    is raised so bursts are rejected quickly instead of piling up.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int) -> None:
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._hash = PasswordHash.recommended()
+        self._limiter: CapacityLimiter | None = None
+        self._pending = 0
+
+    async def hash(self, password: str) -> str:
+        """Hash ``password`` with the current parameters."""
+        return await self._run(self._hash.hash, password)
+
+    async def verify(self, password: str, hash: str) -> bool:
+        """Check ``password`` against ``hash``."""
+        return await self._run(self._hash.verify, password, hash)
+
+    async def verify_and_update(self, password: str, hash: str) -> tuple[bool, str | None]:
+        """Check ``password`` and return a new hash if ``hash`` uses outdated parameters."""
+        return await self._run(self._hash.verify_and_update, password, hash)
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        if self._pending >= self.max_workers + self.max_queue:
+            raise PasswordHasherBusyError("Demasiadas solicitudes de autenticación, intente más tarde")
+
+        if self._limiter is None:
+            # El limiter se crea dentro del event loop
+            self._limiter = CapacityLimiter(self.max_workers)
+
+        self._pending += 1
+        try:
+            return await anyio.to_thread.run_sync(func, *args, limiter=self._limiter)
+        finally:
+            self._pending -= 1
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_queue,
+)
@@ -1,66 +1,329 @@
 """Repository for Book."""
 
-from typing import Sequence
+from datetime import datetime, timezone
+from typing import Any, Iterable, Literal, Sequence
 
-from advanced_alchemy.repository import SQLAlchemySyncRepository
-from sqlalchemy import select, func
-from sqlalchemy.orm import Session
+from advanced_alchemy.exceptions import wrap_sqlalchemy_exception
+from advanced_alchemy.repository import SQLAlchemyAsyncRepository
+from sqlalchemy import Integer, case, column, func, or_, select, update, values
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import Book, BookCategory, Review
+from app.facets import stage_availability
+from app.models import (
+    Book,
+    BookCategory,
+    BookCoBorrow,
+    BookStats,
+    BookStatsGroup,
+    Category,
+    Review,
+    StockAdjustment,
+)
+from app.repositories.fields import SparseFieldsMixin
+from app.repositories.loader import BatchLoaderMixin
+from app.repositories.pagination import KeysetPaginationMixin
 
+BookRelation = Literal["loans", "categories", "reviews"]
 
-class BookRepository(SQLAlchemySyncRepository[Book]):
+
+class BookRepository(
+    BatchLoaderMixin[Book],
+    SparseFieldsMixin[Book],
+    KeysetPaginationMixin[Book],
+    SQLAlchemyAsyncRepository[Book],
+):
     model_type = Book
 
-    def get_available_books(self) -> Sequence[Book]:
+    def expand_options(self, expand: list[BookRelation] | None) -> list | None:
+        """Loader options that eager-load the relationships requested in ``?expand=``."""
+        if not expand:
+            return None
+        return [getattr(Book, relation) for relation in expand]
+
+    async def get_available_books(self) -> Sequence[Book]:
         "Retornar libros con stock > 0."
-        stmt = select(Book).where(Book.stock > 0)
-        return self.session.execute(stmt).scalars().all()
+        return await self.list(Book.stock > 0)
 
-    def find_by_category(self, category_id: int) -> Sequence[Book]:
+    async def find_by_category(self, category_id: int) -> Sequence[Book]:
         "Buscar libros que pertenezcan a una categoría dada."
         stmt = (
             select(Book)
             .join(BookCategory, BookCategory.book_id == Book.id)
             .where(BookCategory.category_id == category_id)
         )
-        return self.session.execute(stmt).scalars().all()
+        return await self.list(statement=stmt)
 
-    def get_most_reviewed_books(self, limit: int = 10) -> Sequence[Book]:
+    async def get_most_reviewed_books(self, limit: int = 10) -> Sequence[Book]:
         "Libros ordenados por cantidad de reseñas (desc)."
         stmt = (
             select(Book)
-            .outerjoin(Review, Review.book_id == Book.id)
-            .group_by(Book.id)
-            .order_by(func.count(Review.id).desc())
+            .order_by(Book.review_count.desc(), Book.id)
+            .limit(limit)
+        )
+        return await self.list(statement=stmt)
+
+    async def get_also_borrowed(self, book_id: int, limit: int = 10) -> Sequence[Book]:
+        "Libros que más usuarios pidieron junto con ``book_id``, desde el índice de co-préstamos."
+        stmt = (
+            select(Book)
+            .join(BookCoBorrow, BookCoBorrow.other_book_id == Book.id)
+            .where(BookCoBorrow.book_id == book_id)
+            .order_by(BookCoBorrow.borrowers.desc(), BookCoBorrow.other_book_id.desc())
             .limit(limit)
         )
-        return self.session.execute(stmt).scalars().all()
+        return await self.list(statement=stmt)
 
-    def update_stock(self, book_id: int, quantity: int) -> Book:
-        """""
+    async def get_top_rated_books(self, limit: int = 10, min_reviews: int = 1) -> Sequence[Book]:
+        "Libros con mejor calificación promedio (desc)."
+        stmt = (
+            select(Book)
+            .where(Book.review_count >= min_reviews, Book.avg_rating.is_not(None))
+            .order_by(Book.avg_rating.desc(), Book.review_count.desc(), Book.id)
+            .limit(limit)
+        )
+        return await self.list(statement=stmt)
+
+    async def refresh_review_stats(self, *book_ids: int) -> None:
+        """
+        Recalcular review_count y avg_rating desde la tabla reviews.
+
+        Sin argumentos recalcula todos los libros. Se recalcula en vez de
+        incrementar para que las estadísticas no se desvíen con el tiempo.
+        """
+        stmt = update(Book).values(
+            review_count=select(func.count(Review.id))
+            .where(Review.book_id == Book.id)
+            .scalar_subquery(),
+            avg_rating=select(func.avg(Review.rating))
+            .where(Review.book_id == Book.id)
+            .scalar_subquery(),
+        )
+        if book_ids:
+            stmt = stmt.where(Book.id.in_(book_ids))
+
+        await self.session.execute(stmt, execution_options={"synchronize_session": False})
+
+        if self.auto_commit:
+            await self.session.commit()
+
+    async def update_stock(
+        self, book_id: int, quantity: int, auto_commit: bool | None = None
+    ) -> Book:
+        """
         Actualizar stock de un libro.
-        """""
-        book = self.get(book_id)
-        current_stock = book.stock or 0
-        new_stock = current_stock + quantity
 
-        if new_stock < 0:
+        Es un único UPDATE condicional, así que dos ajustes concurrentes no
+        pierden actualizaciones ni pueden dejar el stock negativo.
+        """
+        stmt = (
+            update(Book)
+            .where(Book.id == book_id, Book.stock + quantity >= 0)
+            .values(stock=Book.stock + quantity, updated_at=datetime.now(timezone.utc))
+            .returning(Book)
+        )
+        book = (await self.session.scalars(stmt)).one_or_none()
+
+        if book is None:
+            # Lanza NotFoundError si el libro no existe
+            await self.get(book_id)
             raise ValueError("El stock no puede quedar negativo")
 
-        book.stock = new_stock
-        self.session.add(book)
+        stage_availability(self.session, [book])
+        await self._flush_or_commit(auto_commit=auto_commit)
+
+        return book
+
+    async def update_stock_many(
+        self, adjustments: Sequence[StockAdjustment], auto_commit: bool | None = None
+    ) -> Sequence[Book]:
+        """
+        Aplicar varios ajustes de stock en un solo UPDATE ... FROM (VALUES ...).
+
+        Todos los ajustes se aplican o ninguno: si algún libro no existe o
+        quedaría con stock negativo se lanza ValueError.
+        """
+        deltas: dict[int, int] = {}
+        for adjustment in adjustments:
+            deltas[adjustment.book_id] = deltas.get(adjustment.book_id, 0) + adjustment.quantity
+        if not deltas:
+            return []
+
+        rows = values(
+            column("book_id", Integer),
+            column("quantity", Integer),
+            name="adjustments",
+        ).data(list(deltas.items())).cte()
+        stmt = (
+            update(Book)
+            .add_cte(rows)
+            .where(Book.id == rows.c.book_id, Book.stock + rows.c.quantity >= 0)
+            .values(stock=Book.stock + rows.c.quantity, updated_at=datetime.now(timezone.utc))
+            .returning(Book)
+        )
+
+        async with self.session.begin_nested():
+            books = (await self.session.scalars(stmt)).all()
+            failed = sorted(set(deltas) - {book.id for book in books})
+            if failed:
+                raise ValueError(
+                    f"Libros inexistentes o con stock insuficiente: {failed}"
+                )
+
+        stage_availability(self.session, books)
+        await self._flush_or_commit(auto_commit=auto_commit)
+
+        return books
+
+    async def existing_category_ids(self, category_ids: Iterable[int]) -> set[int]:
+        "Subconjunto de ``category_ids`` que existe en la tabla de categorías."
+        category_ids = set(category_ids)
+        if not category_ids:
+            return set()
+        stmt = select(Category.id).where(Category.id.in_(category_ids))
+        return set((await self.session.scalars(stmt)).all())
+
+    async def upsert_many(self, rows: Sequence[dict[str, Any]]) -> dict[str, int]:
+        """
+        Insertar o actualizar (por ISBN) un lote de libros y enlazar sus categorías.
+
+        Cada fila trae las columnas de ``Book`` y opcionalmente ``category_ids``.
+        Usa INSERT ... ON CONFLICT (isbn) DO UPDATE y un INSERT ... ON CONFLICT
+        DO NOTHING para los enlaces, así que reimportar el mismo archivo es seguro.
+        Retorna el id de cada libro indexado por ISBN.
+        """
+        if not rows:
+            return {}
+
+        insert = postgresql.insert if self._dialect.name == "postgresql" else sqlite.insert
+
+        # Un libro existente solo cambia en las columnas que trae la fila,
+        # así que se agrupan las filas según las columnas presentes
+        groups: dict[frozenset[str], list[dict[str, Any]]] = {}
+        for row in rows:
+            book = {key: value for key, value in row.items() if key != "category_ids"}
+            groups.setdefault(frozenset(book), []).append(book)
+
+        ids: dict[str, int] = {}
+        with wrap_sqlalchemy_exception(
+            error_messages=self.error_messages,
+            dialect_name=self._dialect.name,
+            wrap_exceptions=self.wrap_exceptions,
+        ):
+            async with self.session.begin_nested():
+                for keys, books in groups.items():
+                    stmt = insert(Book)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[Book.isbn],
+                        set_={
+                            **{key: stmt.excluded[key] for key in keys - {"isbn"}},
+                            "updated_at": datetime.now(timezone.utc),
+                        },
+                    ).returning(Book.id, Book.isbn)
+                    ids.update(
+                        {isbn: book_id for book_id, isbn in await self.session.execute(stmt, books)}
+                    )
+
+                links = [
+                    {"book_id": ids[row["isbn"]], "category_id": category_id}
+                    for row in rows
+                    for category_id in set(row.get("category_ids") or ())
+                ]
+                if links:
+                    link_stmt = insert(BookCategory).on_conflict_do_nothing(
+                        index_elements=[BookCategory.book_id, BookCategory.category_id],
+                    )
+                    await self.session.execute(link_stmt, links)
 
         if self.auto_commit:
-            self.session.commit()
+            await self.session.commit()
 
-        return book
+        return ids
+
+    async def get_stats(self) -> BookStats:
+        """Aggregate book statistics in the database, globally and per group."""
+        aggregates = (
+            func.count(Book.id),
+            func.coalesce(func.avg(Book.pages), 0),
+            func.min(Book.published_year),
+            func.max(Book.published_year),
+        )
+
+        total, average, oldest, newest = (
+            await self.session.execute(select(*aggregates))
+        ).one()
+
+        async def grouped(key, *joins) -> list[BookStatsGroup]:
+            stmt = select(key, *aggregates)
+            for target, onclause in joins:
+                stmt = stmt.join(target, onclause)
+            stmt = stmt.group_by(key).order_by(func.count(Book.id).desc(), key)
+            return [
+                BookStatsGroup(
+                    key=row[0],
+                    total_books=row[1],
+                    average_pages=float(row[2]),
+                    oldest_publication_year=row[3],
+                    newest_publication_year=row[4],
+                )
+                for row in await self.session.execute(stmt)
+            ]
+
+        return BookStats(
+            total_books=total,
+            average_pages=float(average),
+            oldest_publication_year=oldest,
+            newest_publication_year=newest,
+            by_language=await grouped(Book.language),
+            by_publisher=await grouped(Book.publisher),
+            by_category=await grouped(
+                Category.name,
+                (BookCategory, BookCategory.book_id == Book.id),
+                (Category, Category.id == BookCategory.category_id),
+            ),
+        )
+
+    async def search(self, term: str, limit: int = 20) -> Sequence[Book]:
+        """
+        Buscar libros por título, autor o descripción ordenados por relevancia.
+
+        En PostgreSQL usa similitud trigram (índices GIN de pg_trgm); en otros
+        motores cae en ILIKE, priorizando coincidencias en el título.
+        """
+        pattern = f"%{term}%"
+        matches = or_(
+            Book.title.ilike(pattern),
+            Book.author.ilike(pattern),
+            Book.description.ilike(pattern),
+        )
+
+        if self.session.get_bind().dialect.name == "postgresql":
+            rank = func.greatest(
+                func.similarity(Book.title, term),
+                func.similarity(Book.author, term),
+                func.coalesce(func.word_similarity(term, Book.description), 0) * 0.5,
+            )
+            condition = or_(matches, Book.title.op("%")(term), Book.author.op("%")(term))
+        else:
+            rank = case(
+                (Book.title.ilike(pattern), 2),
+                (Book.author.ilike(pattern), 1),
+                else_=0,
+            )
+            condition = matches
+
+        stmt = (
+            select(Book)
+            .where(condition)
+            .order_by(rank.desc(), Book.title)
+            .limit(limit)
+        )
+        return await self.list(statement=stmt)
 
-    def search_by_author(self, author_name: str) -> Sequence[Book]:
+    async def search_by_author(self, author_name: str) -> Sequence[Book]:
         "Buscar libros por nombre de autor (búsqueda parcial, ilike)."
-        stmt = select(Book).where(Book.author.ilike(f"%{author_name}%"))
-        return self.session.execute(stmt).scalars().all()
+        return await self.list(Book.author.ilike(f"%{author_name}%"))
 
 
-async def provide_book_repo(db_session: Session) -> BookRepository:
+async def provide_book_repo(db_session: AsyncSession) -> BookRepository:
     return BookRepository(session=db_session, auto_commit=True)
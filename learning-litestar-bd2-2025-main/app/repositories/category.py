@@ -1,14 +1,15 @@
 """Category repository."""
 
-from advanced_alchemy.repository import SQLAlchemySyncRepository
-from sqlalchemy.orm import Session
+from advanced_alchemy.repository import SQLAlchemyAsyncRepository
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import Category
+from app.repositories.pagination import KeysetPaginationMixin
 
 
-class CategoryRepository(SQLAlchemySyncRepository[Category]):
+class CategoryRepository(KeysetPaginationMixin[Category], SQLAlchemyAsyncRepository[Category]):
     model_type = Category
 
 
-async def provide_category_repo(db_session: Session) -> CategoryRepository:
+async def provide_category_repo(db_session: AsyncSession) -> CategoryRepository:
     return CategoryRepository(session=db_session, auto_commit=True)
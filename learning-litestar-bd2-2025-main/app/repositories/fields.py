@@ -0,0 +1,58 @@
+"""Sparse fieldsets (``?fields=``) shared by the repositories."""
+
+from typing import Annotated, Any, Generic, TypeVar
+
+from litestar.params import Parameter
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, raiseload
+
+ModelT = TypeVar("ModelT")
+
+FieldsParam = Annotated[
+    list[str] | None,
+    Parameter(description="Campos a incluir, separados por coma: ?fields=id,campo"),
+]
+
+
+class InvalidFieldsError(ValueError):
+    """Raised when ``?fields=`` names a field the resource does not expose."""
+
+
+class SparseFieldsMixin(Generic[ModelT]):
+    """Adds ``field_options`` to an async repository.
+
+    ``?fields=id,title`` becomes ``load_only(...)``, so the SELECT only
+    lists those columns; named relationships are eager-loaded and the
+    others are not loaded at all. Repositories whose ``loader_options``
+    load relationships by default must set ``merge_loader_options = False``
+    for ``?fields=`` to leave them out. The read DTOs skip attributes that
+    were not loaded, so the other fields are neither fetched nor encoded.
+    """
+
+    # Columnas que nunca se exponen, aunque se pidan
+    hidden_fields: frozenset[str] = frozenset()
+
+    def field_options(self, fields: list[str] | None, load: list[Any] | None = None) -> list[Any] | None:
+        """Loader options ``load`` plus the ones that restrict the row to ``fields``."""
+        if not fields:
+            return load
+
+        names = {name.strip() for value in fields for name in value.split(",") if name.strip()}
+        mapper = inspect(self.model_type)
+        exposed = (set(mapper.column_attrs.keys()) | set(mapper.relationships.keys())) - self.hidden_fields
+        if unknown := names - exposed:
+            raise InvalidFieldsError(f"Campos desconocidos: {', '.join(sorted(unknown))}")
+
+        # La clave primaria siempre se carga: identifica la fila y pagina
+        selected = names | {column.key for column in mapper.primary_key}
+        columns = [getattr(self.model_type, name) for name in mapper.column_attrs.keys() if name in selected]
+        options: list[Any] = [load_only(*columns, raiseload=True)]
+        # Las relaciones pedidas se cargan como en ?expand=; las demás no se
+        # cargan, aunque el repositorio las cargue por defecto
+        loaded = {getattr(option, "key", None) for option in load or ()}
+        for name in mapper.relationships.keys():
+            if name in loaded:
+                continue
+            relationship = getattr(self.model_type, name)
+            options.append(relationship if name in names else raiseload(relationship))
+        return [*(load or ()), *options]
@@ -0,0 +1,122 @@
+"""Request-scoped batching of lookups by id, shared by the repositories."""
+
+import asyncio
+from typing import Any, Generic, Iterable, TypeVar
+
+from advanced_alchemy.exceptions import NotFoundError
+
+ModelT = TypeVar("ModelT")
+
+# Ids por consulta: SQLite antiguo admite hasta 999 parámetros
+LOAD_BATCH_SIZE = 500
+
+LOADERS_KEY = "batch_loaders"
+
+
+def _option_key(option: Any) -> Any:
+    # str(load_only(...)) no distingue las columnas: usar la cache key de SQLAlchemy
+    cache_key = option._generate_cache_key()
+    return cache_key.key if cache_key is not None else str(option)
+
+
+class BatchLoader(Generic[ModelT]):
+    """Coalesce the lookups by id of one session into ``WHERE id IN (...)`` queries.
+
+    Ids requested by concurrent tasks before the loader gets to run are
+    fetched together, and every row is cached for the rest of the session,
+    so asking again for the same id costs nothing. The session must not be
+    used by other tasks while a batch is being fetched.
+    """
+
+    def __init__(self, repository: Any, load: list[Any] | None = None) -> None:
+        self.repository = repository
+        self.load_options = load
+        self._cache: dict[Any, ModelT | None] = {}
+        self._pending: dict[Any, asyncio.Future[None]] = {}
+        self._in_flight: dict[Any, asyncio.Future[None]] = {}
+        self._dispatch: asyncio.Task[None] | None = None
+
+    async def load_many(self, ids: Iterable[Any]) -> list[ModelT | None]:
+        """Rows of ``ids`` in the same order, ``None`` for the ids that do not exist."""
+        ids = list(ids)
+        waiting: dict[Any, asyncio.Future[None]] = {}
+        for item_id in ids:
+            if item_id in self._cache or item_id in waiting:
+                continue
+            future = self._pending.get(item_id) or self._in_flight.get(item_id)
+            if future is None:
+                future = self._pending[item_id] = asyncio.get_running_loop().create_future()
+            waiting[item_id] = future
+
+        if waiting:
+            if self._dispatch is None:
+                self._dispatch = asyncio.ensure_future(self._run())
+            errors = [
+                error
+                for error in await asyncio.gather(*waiting.values(), return_exceptions=True)
+                if error is not None
+            ]
+            if errors:
+                raise errors[0]
+
+        return [self._cache.get(item_id) for item_id in ids]
+
+    async def load(self, item_id: Any) -> ModelT | None:
+        """Row of ``item_id``, or ``None`` if it does not exist."""
+        return (await self.load_many([item_id]))[0]
+
+    async def _run(self) -> None:
+        try:
+            # Ceder una vez para que las demás tareas encolen sus ids
+            await asyncio.sleep(0)
+            while self._pending:
+                self._in_flight, self._pending = self._pending, {}
+                pending = self._in_flight
+                try:
+                    await self._fetch(list(pending))
+                except Exception as exc:
+                    for future in pending.values():
+                        future.set_exception(exc)
+                else:
+                    for future in pending.values():
+                        future.set_result(None)
+        finally:
+            self._in_flight = {}
+            self._dispatch = None
+
+    async def _fetch(self, ids: list[Any]) -> None:
+        model = self.repository.model_type
+        for start in range(0, len(ids), LOAD_BATCH_SIZE):
+            chunk = ids[start:start + LOAD_BATCH_SIZE]
+            rows = await self.repository.list(model.id.in_(chunk), load=self.load_options)
+            found = {row.id: row for row in rows}
+            for item_id in chunk:
+                self._cache[item_id] = found.get(item_id)
+
+
+class BatchLoaderMixin(Generic[ModelT]):
+    """Adds ``load`` and ``load_many`` to an async repository.
+
+    Loaders live in ``session.info``, so they are scoped to the session of
+    the request: every repository of the same model sharing that session
+    batches and caches its lookups together.
+    """
+
+    def loader(self, load: list[Any] | None = None) -> BatchLoader[ModelT]:
+        """The loader of this model (and loader options) for the current session."""
+        loaders = self.session.info.setdefault(LOADERS_KEY, {})
+        key = (self.model_type, tuple(_option_key(option) for option in load or ()))
+        if key not in loaders:
+            loaders[key] = BatchLoader(self, load)
+        return loaders[key]
+
+    async def load(self, item_id: Any, load: list[Any] | None = None) -> ModelT:
+        """Like ``get``, batched with the other lookups of the request."""
+        row = await self.loader(load).load(item_id)
+        if row is None:
+            raise NotFoundError(f"No {self.model_type.__name__} found with id {item_id!r}")
+        return row
+
+    async def load_many(self, ids: Iterable[Any], load: list[Any] | None = None) -> list[ModelT]:
+        """Rows of ``ids`` that exist, in the order requested, in a single batched query."""
+        return [row for row in await self.loader(load).load_many(ids) if row is not None]
@@ -1,17 +1,276 @@
 """Repository for Loan database operations."""
 
-from advanced_alchemy.repository import SQLAlchemySyncRepository
-from sqlalchemy.orm import Session
+from collections import Counter, defaultdict
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Callable, Iterable, Literal
 
-from app.models import Loan
+from advanced_alchemy.repository import SQLAlchemyAsyncRepository
+from sqlalchemy import (
+    Date,
+    Integer,
+    Numeric,
+    and_,
+    bindparam,
+    case,
+    cast,
+    delete,
+    func,
+    or_,
+    select,
+    true,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.models import BookCoBorrow, Loan, LoanStatus
+from app.repositories.fields import SparseFieldsMixin
+from app.repositories.loader import BatchLoaderMixin
+from app.repositories.pagination import KeysetPaginationMixin
 
-class LoanRepository(SQLAlchemySyncRepository[Loan]):
+LoanRelation = Literal["user", "book"]
+
+
+class LoanRepository(
+    BatchLoaderMixin[Loan],
+    SparseFieldsMixin[Loan],
+    KeysetPaginationMixin[Loan],
+    SQLAlchemyAsyncRepository[Loan],
+):
     """Repository for loan database operations."""
 
     model_type = Loan
 
+    def expand_options(self, expand: list[LoanRelation] | None) -> list | None:
+        """Loader options that eager-load the relationships requested in ``?expand=``."""
+        if not expand:
+            return None
+        return [getattr(Loan, relation) for relation in expand]
+
+    def _fine(self, today: date, fine_per_day: Decimal):
+        """SQL expression for the fine of a loan overdue as of ``today``."""
+        today_param = bindparam("today", today, type_=Date)
+        if self.session.get_bind().dialect.name == "postgresql":
+            days = today_param - Loan.due_date
+        else:
+            days = cast(func.julianday(today_param) - func.julianday(Loan.due_date), Integer)
+        return cast(days * fine_per_day, Numeric(10, 2))
+
+    async def mark_returned(
+        self,
+        loan_id: int,
+        return_dt: date,
+        fine_per_day: Decimal,
+        auto_commit: bool | None = None,
+    ) -> Loan:
+        """
+        Marcar un préstamo como devuelto, con su multa final si se atrasó.
+
+        Es un UPDATE condicional sobre préstamos no devueltos, así que dos
+        devoluciones simultáneas del mismo préstamo no pueden pasar ambas.
+        """
+        stmt = (
+            update(Loan)
+            .where(
+                Loan.id == loan_id,
+                Loan.status.in_([LoanStatus.ACTIVE, LoanStatus.OVERDUE]),
+            )
+            .values(
+                status=LoanStatus.RETURNED,
+                return_dt=return_dt,
+                fine_amount=case(
+                    (Loan.due_date < return_dt, self._fine(return_dt, fine_per_day)),
+                    else_=Loan.fine_amount,
+                ),
+                updated_at=datetime.now(timezone.utc),
+            )
+            .returning(Loan)
+        )
+        loan = (await self.session.scalars(stmt)).one_or_none()
+
+        if loan is None:
+            # Lanza NotFoundError si el préstamo no existe
+            await self.get(loan_id)
+            raise ValueError("El préstamo ya fue devuelto")
+
+        await self._flush_or_commit(auto_commit=auto_commit)
+        return loan
+
+    async def mark_overdue(
+        self,
+        today: date,
+        fine_per_day: Decimal,
+        chunk_size: int = 10_000,
+        on_progress: Callable[[LoanStatus, int], None] | None = None,
+    ) -> int:
+        """
+        Marcar como OVERDUE los préstamos vencidos y recalcular su multa.
+
+        La multa es ``días de atraso * fine_per_day`` a la fecha ``today``, así
+        que correr el proceso de nuevo el mismo día no cambia nada. Los
+        préstamos se recorren por (status, due_date, id) en bloques de
+        ``chunk_size``, con un UPDATE por bloque que se confirma por separado.
+        ``on_progress(status, actualizados en ese status)`` se llama tras cada bloque.
+        Retorna la cantidad de préstamos actualizados.
+        """
+        fine = self._fine(today, fine_per_day)
+        key = tuple_(Loan.due_date, Loan.id)
+        updated = 0
+
+        # Primero los ya vencidos, para no revisar de nuevo los que se marquen ahora
+        for status in (LoanStatus.OVERDUE, LoanStatus.ACTIVE):
+            status_updated = 0
+            lower = None
+            while True:
+                pending = (Loan.status == status, Loan.due_date < today)
+                after = key > tuple_(*lower) if lower is not None else true()
+
+                # Último (due_date, id) del bloque; None si es el último bloque
+                boundary_stmt = (
+                    select(Loan.due_date, Loan.id)
+                    .where(*pending, after)
+                    .order_by(Loan.due_date, Loan.id)
+                    .offset(chunk_size - 1)
+                    .limit(1)
+                )
+                upper = (await self.session.execute(boundary_stmt)).first()
+                in_chunk = key <= tuple_(*upper) if upper is not None else true()
+
+                stmt = (
+                    update(Loan)
+                    .where(
+                        *pending,
+                        after,
+                        in_chunk,
+                        or_(
+                            Loan.status != LoanStatus.OVERDUE,
+                            Loan.fine_amount.is_(None),
+                            Loan.fine_amount != fine,
+                        ),
+                    )
+                    .values(
+                        status=LoanStatus.OVERDUE,
+                        fine_amount=fine,
+                        updated_at=datetime.now(timezone.utc),
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                result = await self.session.execute(stmt)
+                await self.session.commit()
+
+                updated += result.rowcount
+                status_updated += result.rowcount
+                if on_progress is not None:
+                    on_progress(status, status_updated)
+                if upper is None:
+                    break
+                lower = upper
+
+        return updated
+
+    def _upsert_co_borrows(self):
+        """INSERT into book_co_borrows that adds to the count of existing pairs."""
+        insert = postgresql.insert if self._dialect.name == "postgresql" else sqlite.insert
+        stmt = insert(BookCoBorrow)
+        return stmt.on_conflict_do_update(
+            index_elements=[BookCoBorrow.book_id, BookCoBorrow.other_book_id],
+            set_={"borrowers": BookCoBorrow.borrowers + stmt.excluded.borrowers},
+        )
+
+    async def add_co_borrows(self, loans: Iterable[Loan], auto_commit: bool | None = None) -> None:
+        """
+        Actualizar el índice de co-préstamos con préstamos recién creados.
+
+        Un par de libros cuenta una vez por usuario: cuando el usuario pide
+        por primera vez un libro, se suma 1 a su par con cada libro distinto
+        que ya había pedido. Dos checkouts simultáneos del mismo usuario
+        pueden no verse entre sí; ``rebuild_co_borrows`` corrige esa deriva.
+        """
+        by_user: defaultdict[int, list[Loan]] = defaultdict(list)
+        for loan in sorted(loans, key=lambda loan: loan.id):
+            by_user[loan.user_id].append(loan)
+
+        pairs: Counter[tuple[int, int]] = Counter()
+        for user_id, user_loans in by_user.items():
+            borrowed = set(await self.session.scalars(
+                select(Loan.book_id)
+                .where(Loan.user_id == user_id, Loan.id < user_loans[0].id)
+                .distinct()
+            ))
+            for loan in user_loans:
+                if loan.book_id in borrowed:
+                    continue
+                for other_book_id in borrowed:
+                    pairs[(loan.book_id, other_book_id)] += 1
+                    pairs[(other_book_id, loan.book_id)] += 1
+                borrowed.add(loan.book_id)
+
+        if pairs:
+            await self.session.execute(
+                self._upsert_co_borrows(),
+                [
+                    {"book_id": book_id, "other_book_id": other_book_id, "borrowers": borrowers}
+                    for (book_id, other_book_id), borrowers in sorted(pairs.items())
+                ],
+            )
+        await self._flush_or_commit(auto_commit=auto_commit)
+
+    async def rebuild_co_borrows(
+        self,
+        chunk_size: int = 5_000,
+        on_progress: Callable[[int], None] | None = None,
+    ) -> int:
+        """
+        Recalcular desde cero el índice de co-préstamos.
+
+        Los usuarios se recorren por id en bloques de ``chunk_size``; cada
+        bloque es un INSERT ... SELECT que suma sus pares y se confirma por
+        separado, así que mientras corre las recomendaciones son parciales.
+        ``on_progress(filas escritas)`` se llama tras cada bloque.
+        Retorna la cantidad de pares en el índice.
+        """
+        await self.session.execute(delete(BookCoBorrow))
+        await self.session.commit()
+
+        written = 0
+        lower = None
+        while True:
+            after = Loan.user_id > lower if lower is not None else true()
+            # Último usuario del bloque; None si es el último bloque
+            upper = await self.session.scalar(
+                select(Loan.user_id)
+                .where(after)
+                .distinct()
+                .order_by(Loan.user_id)
+                .offset(chunk_size - 1)
+                .limit(1)
+            )
+            in_chunk = Loan.user_id <= upper if upper is not None else true()
+
+            borrowed = select(Loan.user_id, Loan.book_id).where(after, in_chunk).distinct().subquery()
+            other = borrowed.alias("other")
+            pairs = (
+                select(borrowed.c.book_id, other.c.book_id, func.count())
+                .join(other, and_(other.c.user_id == borrowed.c.user_id, other.c.book_id != borrowed.c.book_id))
+                .group_by(borrowed.c.book_id, other.c.book_id)
+            )
+            result = await self.session.execute(
+                self._upsert_co_borrows().from_select(["book_id", "other_book_id", "borrowers"], pairs)
+            )
+            await self.session.commit()
+
+            written += result.rowcount
+            if on_progress is not None:
+                on_progress(written)
+            if upper is None:
+                break
+            lower = upper
+
+        return await self.session.scalar(select(func.count()).select_from(BookCoBorrow))
+
 
-async def provide_loan_repo(db_session: Session) -> LoanRepository:
+async def provide_loan_repo(db_session: AsyncSession) -> LoanRepository:
     """Provide loan repository instance with auto-commit."""
     return LoanRepository(session=db_session, auto_commit=True)
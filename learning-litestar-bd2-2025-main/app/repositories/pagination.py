@@ -0,0 +1,101 @@
+"""Keyset (cursor) pagination shared by the repositories."""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Generic, TypeVar
+
+from sqlalchemy import ColumnElement, select, tuple_
+
+from app.models import CursorPage
+
+ModelT = TypeVar("ModelT")
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(direction: str, values: tuple[Any, ...]) -> str:
+    """Encode a keyset position as an opaque, URL-safe cursor."""
+    payload = [
+        direction,
+        [value.isoformat() if isinstance(value, datetime) else value for value in values],
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: list[Any]) -> tuple[str, tuple[Any, ...]]:
+    """Decode a cursor produced by :func:`encode_cursor` for the given key columns."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        direction, values = json.loads(raw)
+        if direction not in ("next", "prev") or len(values) != len(columns):
+            raise ValueError
+        return direction, tuple(
+            datetime.fromisoformat(value) if column.type.python_type is datetime else value
+            for column, value in zip(columns, values)
+        )
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursorError("Cursor de paginación inválido") from exc
+
+
+class KeysetPaginationMixin(Generic[ModelT]):
+    """Adds ``list_page`` to an async repository.
+
+    Pages are located with ``WHERE (key columns) > (last seen values)`` instead
+    of ``OFFSET``, so every page costs the same no matter how deep it is.
+    """
+
+    async def list_page(
+        self,
+        *filters: ColumnElement[bool],
+        cursor: str | None = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        keyset: tuple[str, ...] = ("id",),
+        descending: bool = False,
+        load: list[Any] | None = None,
+    ) -> CursorPage[ModelT]:
+        """Return one page of rows ordered by ``keyset`` plus next/prev cursors."""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        columns = [getattr(self.model_type, name) for name in keyset]
+        key = tuple_(*columns)
+
+        direction = "next"
+        stmt = select(self.model_type)
+        if cursor is not None:
+            direction, values = decode_cursor(cursor, columns)
+            # Avanzar hacia atrás es lo mismo que avanzar con el orden invertido
+            after = (direction == "next") != descending
+            stmt = stmt.where(key > tuple_(*values) if after else key < tuple_(*values))
+
+        reverse = (direction == "prev") != descending
+        stmt = stmt.order_by(*(column.desc() if reverse else column.asc() for column in columns))
+        stmt = stmt.limit(limit + 1)
+
+        rows = list(await self.list(*filters, statement=stmt, load=load))
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if direction == "prev":
+            rows.reverse()
+
+        def position(row: ModelT) -> tuple[Any, ...]:
+            return tuple(getattr(row, name) for name in keyset)
+
+        next_cursor = prev_cursor = None
+        if rows:
+            if direction == "prev" or has_more:
+                next_cursor = encode_cursor("next", position(rows[-1]))
+            if cursor is not None and (direction == "next" or has_more):
+                prev_cursor = encode_cursor("prev", position(rows[0]))
+
+        return CursorPage(
+            items=rows,
+            limit=limit,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
+        )
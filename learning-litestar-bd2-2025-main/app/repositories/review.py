@@ -1,14 +1,16 @@
 """Repository for Review."""
 
-from advanced_alchemy.repository import SQLAlchemySyncRepository
-from sqlalchemy.orm import Session
+from advanced_alchemy.repository import SQLAlchemyAsyncRepository
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import Review
+from app.repositories.pagination import KeysetPaginationMixin
 
 
-class ReviewRepository(SQLAlchemySyncRepository[Review]):
+class ReviewRepository(KeysetPaginationMixin[Review], SQLAlchemyAsyncRepository[Review]):
     model_type = Review
+    loader_options = [Review.user, Review.book]
 
 
-async def provide_review_repo(db_session: Session) -> ReviewRepository:
+async def provide_review_repo(db_session: AsyncSession) -> ReviewRepository:
     return ReviewRepository(session=db_session, auto_commit=True)
@@ -1,28 +1,40 @@
 """Repository for User database operations."""
 
-from advanced_alchemy.repository import SQLAlchemySyncRepository
+from advanced_alchemy.repository import SQLAlchemyAsyncRepository
 from litestar.dto import DTOData
-from pwdlib import PasswordHash
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import User
-
-password_hasher = PasswordHash.recommended()
-
-
-class UserRepository(SQLAlchemySyncRepository[User]):
+from app.passwords import password_hasher
+from app.repositories.fields import SparseFieldsMixin
+from app.repositories.loader import BatchLoaderMixin
+from app.repositories.pagination import KeysetPaginationMixin
+
+
+class UserRepository(
+    BatchLoaderMixin[User],
+    SparseFieldsMixin[User],
+    KeysetPaginationMixin[User],
+    SQLAlchemyAsyncRepository[User],
+):
     """Repository for user database operations."""
 
     model_type = User
+    loader_options = [User.reviews]
+    # Un load explícito (?fields=) reemplaza a las reseñas por defecto
+    merge_loader_options = False
+    hidden_fields = frozenset({"password"})
 
-    def add_with_hashed_password(self, data: DTOData[User]):
+    async def add_with_hashed_password(self, data: DTOData[User]):
         """Add user with hashed password."""
         data_dict = data.as_builtins()
-        data_dict["password"] = password_hasher.hash(data_dict["password"])
+        data_dict["password"] = await password_hasher.hash(data_dict["password"])
 
-        return self.add(User(**data_dict))
+        user = await self.add(User(**data_dict))
+        # Volver a leer el usuario para cargar sus relaciones
+        return await self.get(user.id)
 
 
-async def provide_user_repo(db_session: Session) -> UserRepository:
+async def provide_user_repo(db_session: AsyncSession) -> UserRepository:
     """Provide user repository instance with auto-commit."""
     return UserRepository(session=db_session, auto_commit=True)
@@ -1,29 +1,131 @@
 """OAuth2 authentication and security configuration."""
 
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from litestar import Litestar
 from litestar.connection import ASGIConnection
+from litestar.exceptions import PermissionDeniedException
+from litestar.handlers.base import BaseRouteHandler
 from litestar.security.jwt import OAuth2PasswordBearerAuth, Token
+from litestar.stores.base import Store
 
 from app.config import settings
 from app.models import User
 from app.repositories.user import UserRepository
 
 
+class UserCache:
+    """TTL/LRU cache of authenticated users keyed by token subject.
+
+    Entries live in an in-process LRU. When ``backend`` is set to a Litestar
+    :class:`Store` (e.g. Redis), users are also shared between workers there,
+    without the password hash.
+    """
+
+    def __init__(self, maxsize: int, ttl: int, backend: Store | None = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self._entries: OrderedDict[str, tuple[float, User]] = OrderedDict()
+
+    async def get(self, username: str) -> User | None:
+        """Return the cached user or ``None`` if missing or expired."""
+        entry = self._entries.get(username)
+        if entry is not None:
+            expires_at, user = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(username)
+                return user
+            del self._entries[username]
+
+        if self.backend is None:
+            return None
+
+        raw = await self.backend.get(username)
+        if raw is None:
+            return None
+        user = _user_from_json(raw)
+        self._remember(username, user)
+        return user
+
+    async def set(self, user: User) -> None:
+        """Cache ``user`` under its username."""
+        self._remember(user.username, user)
+        if self.backend is not None:
+            await self.backend.set(user.username, _user_to_json(user), expires_in=self.ttl)
+
+    async def invalidate(self, username: str) -> None:
+        """Drop ``username`` from the cache after the user changed."""
+        self._entries.pop(username, None)
+        if self.backend is not None:
+            await self.backend.delete(username)
+
+    def _remember(self, username: str, user: User) -> None:
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        self._entries[username] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(username)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+def _user_to_json(user: User) -> bytes:
+    data = {
+        column.key: getattr(user, column.key)
+        for column in User.__table__.columns
+        if column.key != "password"
+    }
+    return json.dumps(data, default=datetime.isoformat).encode()
+
+
+def _user_from_json(raw: bytes) -> User:
+    data = json.loads(raw)
+    for key in ("created_at", "updated_at"):
+        data[key] = datetime.fromisoformat(data[key])
+    return User(**data, password="")
+
+
+user_cache = UserCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl)
+
+
+def configure_user_cache(app: Litestar) -> None:
+    """Attach the shared store named in settings, if any, to the user cache."""
+    if settings.user_cache_store is not None:
+        user_cache.backend = app.stores.get(settings.user_cache_store)
+
+
 async def retrieve_user_handler(token: Token, _: ASGIConnection) -> User | None:
     """Retrieve user based on JWT token."""
     from app.db import sqlalchemy_config
 
-    with sqlalchemy_config.get_session() as session:
+    user = await user_cache.get(token.sub)
+    if user is not None:
+        return user
+
+    async with sqlalchemy_config.get_session() as session:
         users_repo = UserRepository(session=session)
 
         try:
-            return users_repo.get_one(username=token.sub)
+            user = await users_repo.get_one(username=token.sub)
         except Exception:
             return None
 
+    await user_cache.set(user)
+    return user
+
 
 oauth2_auth = OAuth2PasswordBearerAuth[User](
     retrieve_user_handler=retrieve_user_handler,
     token_secret=settings.jwt_secret_key,
     token_url="/auth/login",
-    exclude=["/auth/login", "/schema"],
+    exclude=["/auth/login", "/schema", "^/metrics$"],
 )
+
+
+def admin_guard(connection: ASGIConnection, _: BaseRouteHandler) -> None:
+    """Allow only the users listed in ``settings.admin_usernames``."""
+    if connection.user.username not in settings.admin_usernames:
+        raise PermissionDeniedException("Solo los administradores pueden acceder a este recurso")
@@ -0,0 +1,291 @@
+"""In-memory content-based index of similar books."""
+
+import heapq
+import math
+import re
+import unicodedata
+from array import array
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from operator import itemgetter
+from typing import Any, Iterable, Sequence
+
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.indexes import BackgroundIndex, BookIndex
+from app.models import Book, SimilarBook
+
+TOKEN_PATTERN = re.compile(r"\w{2,}")
+
+# Peso de cada campo en el vector de un libro
+FIELD_WEIGHTS = {
+    "title": 2.0,
+    "description": 1.0,
+    "author": 3.0,
+    "publisher": 1.0,
+    "language": 0.5,
+    "category": 2.0,
+}
+
+# Slots libres que se toleran antes de compactar, aunque el índice sea pequeño
+COMPACT_MIN_SLOTS = 1000
+
+BOOK_COLUMNS = (Book.id, Book.title, Book.author, Book.description, Book.language, Book.publisher)
+
+
+def _normalize(value: str) -> str:
+    """Casefold and strip accents, so ``Canción`` and ``cancion`` match."""
+    decomposed = unicodedata.normalize("NFKD", value.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def book_features(
+    title: str,
+    author: str,
+    description: str | None,
+    language: str,
+    publisher: str | None,
+    category_ids: Iterable[int],
+) -> dict[str, float]:
+    """Weighted term frequencies of a book, before IDF weighting."""
+    counts: Counter[str] = Counter()
+    for field, text in (("title", title), ("description", description)):
+        for token in TOKEN_PATTERN.findall(_normalize(text or "")):
+            counts[f"w:{token}"] += FIELD_WEIGHTS[field]
+    # Autor y editorial completos: "García Márquez" no debe parecerse a "Ana García"
+    counts[f"a:{_normalize(author).strip()}"] += FIELD_WEIGHTS["author"]
+    if publisher:
+        counts[f"p:{_normalize(publisher).strip()}"] += FIELD_WEIGHTS["publisher"]
+    counts[f"l:{language.lower()}"] += FIELD_WEIGHTS["language"]
+    for category_id in category_ids:
+        counts[f"c:{category_id}"] += FIELD_WEIGHTS["category"]
+    # TF sublineal: repetir una palabra no la vuelve dominante
+    return {term: 1 + math.log(count) if count > 1 else count for term, count in counts.items()}
+
+
+@dataclass(slots=True)
+class _Entry:
+    """A book as stored in one slot of the index."""
+
+    book_id: int
+    title: str
+    author: str
+    terms: array
+    frequencies: array
+    # Vector TF-IDF normalizado, con el IDF del momento en que se indexó
+    weights: array = field(default_factory=lambda: array("f"))
+
+
+class SimilarityIndex(BookIndex):
+    """Normalized TF-IDF vectors of the catalogue with top-k cosine search.
+
+    Each term has an inverted list of the slots (books) that contain it and
+    their weights, so a query only touches the books that share a term with
+    it. Books can be added, replaced or removed one at a time: a new book is
+    weighted with the current IDF, and a replaced or removed one leaves its
+    old slot in the lists. :meth:`compact` drops those slots and reweights
+    every book; it runs after the initial build and, on a copy built in the
+    background, whenever half of the slots are unused.
+
+    A query reads the inverted lists of its rarest terms first, up to
+    ``max_postings`` entries in total. The remaining, more common terms
+    weigh little: they are only added to the ``max_candidates`` best
+    candidates found through the rarer ones, so the cost of a query does
+    not grow with the size of the catalogue.
+    """
+
+    columns = BOOK_COLUMNS
+
+    def __init__(self, max_postings: int = 10_000, max_candidates: int = 200) -> None:
+        super().__init__()
+        self.max_postings = max_postings
+        self.max_candidates = max_candidates
+        self._vocabulary: dict[str, int] = {}
+        self._document_frequency = array("i")
+        self._postings: list[array] = []
+        self._posting_weights: list[array] = []
+        self._entries: list[_Entry | None] = []
+        self._slots: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, book_id: int) -> bool:
+        return book_id in self._slots
+
+    def empty(self) -> "SimilarityIndex":
+        return SimilarityIndex(max_postings=self.max_postings, max_candidates=self.max_candidates)
+
+    def _term_id(self, term: str) -> int:
+        term_id = self._vocabulary.get(term)
+        if term_id is None:
+            term_id = self._vocabulary[term] = len(self._postings)
+            self._document_frequency.append(0)
+            self._postings.append(array("i"))
+            self._posting_weights.append(array("f"))
+        return term_id
+
+    def _insert(self, entry: _Entry) -> None:
+        """Weight ``entry`` with the current IDF and append it to the inverted lists."""
+        slot = len(self._entries)
+        self._entries.append(entry)
+        self._slots[entry.book_id] = slot
+
+        total = len(self._slots) + 1
+        weights = [
+            frequency * (math.log(total / (self._document_frequency[term_id] + 1)) + 1)
+            for term_id, frequency in zip(entry.terms, entry.frequencies)
+        ]
+        norm = math.sqrt(sum(weight * weight for weight in weights)) or 1.0
+        entry.weights = array("f", (weight / norm for weight in weights))
+        for term_id, weight in zip(entry.terms, entry.weights):
+            self._postings[term_id].append(slot)
+            self._posting_weights[term_id].append(weight)
+
+    def add(self, book_id: int, title: str, author: str, features: dict[str, float]) -> None:
+        """Index a book, replacing its previous version if there is one."""
+        self.remove(book_id)
+
+        entry = _Entry(
+            book_id,
+            title,
+            author,
+            array("i", (self._term_id(term) for term in features)),
+            array("f", features.values()),
+        )
+        for term_id in entry.terms:
+            self._document_frequency[term_id] += 1
+        self._insert(entry)
+
+    def add_rows(self, rows: Sequence[Row[Any]], categories: dict[int, list[int]]) -> None:
+        for row in rows:
+            self.add(
+                row.id,
+                row.title,
+                row.author,
+                book_features(
+                    row.title,
+                    row.author,
+                    row.description,
+                    row.language,
+                    row.publisher,
+                    categories.get(row.id, ()),
+                ),
+            )
+
+    def remove(self, book_id: int) -> None:
+        """Drop a book from the index, if it is there."""
+        slot = self._slots.pop(book_id, None)
+        if slot is None:
+            return
+        entry = self._entries[slot]
+        self._entries[slot] = None
+        for term_id in entry.terms:
+            self._document_frequency[term_id] -= 1
+
+    @property
+    def needs_compaction(self) -> bool:
+        # Compactar cuando la mitad de los slots ya no se usa
+        return len(self._entries) > 2 * len(self._slots) + COMPACT_MIN_SLOTS
+
+    def copy(self) -> "SimilarityIndex":
+        # Solo copias de listas y arrays, hechas en C: compact() arma el resto
+        index = self.empty()
+        index._vocabulary = self._vocabulary.copy()
+        index._document_frequency = array("i", self._document_frequency)
+        index._entries = self._entries.copy()
+        return index
+
+    def compact(self) -> None:
+        """Rewrite the inverted lists without unused slots, reweighting every book."""
+        # Entradas nuevas: las anteriores pueden seguir en uso en el índice copiado
+        entries = [
+            _Entry(entry.book_id, entry.title, entry.author, entry.terms, entry.frequencies)
+            for entry in self._entries
+            if entry is not None
+        ]
+        self._entries = []
+        self._slots = {}
+        self._postings = [array("i") for _ in self._vocabulary]
+        self._posting_weights = [array("f") for _ in self._vocabulary]
+        # len(self._slots) crece al reinsertar: fijar el total de una vez
+        for entry in entries:
+            self._slots[entry.book_id] = -1
+        for entry in entries:
+            del self._slots[entry.book_id]
+            self._insert(entry)
+
+    def finish_load(self) -> None:
+        # Los primeros libros se pesaron con el IDF de un catálogo casi vacío
+        self.compact()
+
+    def similar(self, book_id: int, limit: int = 10) -> list[SimilarBook]:
+        """
+        Books most similar to ``book_id``, by cosine similarity of their TF-IDF vectors.
+
+        Raises ``KeyError`` if the book is not indexed.
+        """
+        slot = self._slots[book_id]
+        entry = self._entries[slot]
+
+        # Producto punto parcial con los libros que comparten los términos más
+        # raros, hasta revisar max_postings entradas de las listas invertidas
+        scores: defaultdict[int, float] = defaultdict(float)
+        common: list[tuple[int, float]] = []
+        budget = self.max_postings
+        for term_id, weight in sorted(
+            zip(entry.terms, entry.weights),
+            key=lambda item: len(self._postings[item[0]]),
+        ):
+            postings = self._postings[term_id]
+            if len(postings) > budget:
+                common.append((term_id, weight))
+                continue
+            budget -= len(postings)
+            for candidate, candidate_weight in zip(postings, self._posting_weights[term_id]):
+                scores[candidate] += weight * candidate_weight
+
+        if common and not scores:
+            # Solo términos comunes: candidatos entre los libros más recientes del menos común
+            term_id = common[0][0]
+            scores.update(dict.fromkeys(self._postings[term_id][-self.max_postings:], 0.0))
+        scores.pop(slot, None)
+
+        candidates = scores.items()
+        if common:
+            candidates = heapq.nlargest(self.max_candidates, candidates, key=itemgetter(1))
+
+        ranked = []
+        for candidate, score in candidates:
+            other = self._entries[candidate]
+            if other is None:
+                continue
+            if common:
+                weights = dict(zip(other.terms, other.weights))
+                score += sum(weight * weights.get(term_id, 0.0) for term_id, weight in common)
+            if score > 0:
+                ranked.append((score, other.book_id, other))
+
+        return [
+            SimilarBook(id=other.book_id, title=other.title, author=other.author, score=round(score, 4))
+            for score, _, other in heapq.nlargest(limit, ranked, key=itemgetter(0, 1))
+        ]
+
+
+similar_books = SimilarityIndex(
+    max_postings=settings.similar_books_max_postings,
+    max_candidates=settings.similar_books_max_candidates,
+)
+similar_books_builder = BackgroundIndex(
+    "libros similares",
+    similar_books,
+    enabled=settings.similar_books_enabled,
+    batch_size=settings.similar_books_batch_size,
+)
+
+
+async def refresh_similar_books(session: AsyncSession, book_ids: Iterable[int]) -> None:
+    """Re-read ``book_ids`` from the database and reindex them; missing books are removed."""
+    await similar_books_builder.refresh(session, book_ids)
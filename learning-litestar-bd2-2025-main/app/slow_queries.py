@@ -0,0 +1,119 @@
+"""Opt-in log of slow SQL statements with sampled EXPLAIN plans."""
+
+import logging
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+from app.config import settings
+from app.metrics import request_queries_var
+from app.models import SlowQuery
+
+logger = logging.getLogger(__name__)
+
+MAX_PARAMETERS_LENGTH = 1000
+EXPLAIN_SAVEPOINT = "slow_query_explain"
+
+# Entradas más recientes de este worker
+slow_queries: deque[SlowQuery] = deque(maxlen=settings.slow_query_log_size)
+
+
+def _explain_statement(dialect: str, statement: str) -> str | None:
+    if dialect == "postgresql":
+        # ANALYZE vuelve a ejecutar la sentencia: solo se usa con lecturas
+        if statement.lstrip().split(None, 1)[0].upper() == "SELECT":
+            return f"EXPLAIN (ANALYZE, BUFFERS) {statement}"
+        return f"EXPLAIN {statement}"
+    if dialect == "sqlite":
+        return f"EXPLAIN QUERY PLAN {statement}"
+    return None
+
+
+def _explain(conn: Connection, statement: str, parameters: Any) -> str | None:
+    """Plan of ``statement``, run on a separate cursor of the same connection."""
+    explain = _explain_statement(conn.dialect.name, statement)
+    if explain is None:
+        return None
+
+    # Un SAVEPOINT evita que un EXPLAIN fallido aborte la transacción en PostgreSQL
+    savepoint = conn.dialect.name == "postgresql"
+    # El cursor de la sentencia original puede tener filas pendientes
+    cursor = conn.connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute(f"SAVEPOINT {EXPLAIN_SAVEPOINT}")
+        cursor.execute(explain, parameters)
+        rows = cursor.fetchall()
+        if savepoint:
+            cursor.execute(f"RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}")
+    except Exception as exc:
+        if savepoint:
+            try:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}")
+            except Exception:
+                pass
+        return f"EXPLAIN falló: {exc}"
+    finally:
+        cursor.close()
+
+    # PostgreSQL devuelve una línea por fila; SQLite deja el detalle al final
+    return "\n".join(str(row[-1]) for row in rows)
+
+
+def _format_parameters(parameters: Any) -> str:
+    text = repr(parameters)
+    if len(text) > MAX_PARAMETERS_LENGTH:
+        return text[:MAX_PARAMETERS_LENGTH] + "..."
+    return text
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if settings.slow_query_threshold_ms is not None:
+        conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if settings.slow_query_threshold_ms is None:
+        return
+
+    duration_ms = (time.perf_counter() - conn.info["slow_query_start"].pop()) * 1000
+    if duration_ms < settings.slow_query_threshold_ms:
+        return
+
+    request = request_queries_var.get()
+    entry = SlowQuery(
+        recorded_at=datetime.now(timezone.utc),
+        duration_ms=round(duration_ms, 3),
+        statement=statement,
+        parameters=_format_parameters(parameters),
+        method=request.method if request is not None else None,
+        route=request.route if request is not None else None,
+    )
+    # EXPLAIN cuesta otra ejecución: solo a una muestra, y nunca a un executemany
+    if not executemany and random.random() < settings.slow_query_explain_sample_rate:
+        entry.plan = _explain(conn, statement, parameters)
+    slow_queries.append(entry)
+
+    logger.warning(
+        "Consulta lenta (%.1f ms) en %s %s: %s\nParámetros: %s%s",
+        entry.duration_ms,
+        entry.method or "-",
+        entry.route or "-",
+        statement,
+        entry.parameters,
+        f"\nPlan:\n{entry.plan}" if entry.plan is not None else "",
+    )
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context) -> None:
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("slow_query_start"):
+        connection.info["slow_query_start"].pop()
@@ -0,0 +1,20 @@
+"""Reproducible load benchmarks of the API.
+
+Seed a database with a synthetic dataset, run the endpoints of the book,
+loan, user and auth controllers through the app's ASGI interface and
+compare the results with a saved baseline::
+
+    python -m benchmarks run --books 5000 --output baseline.json
+    python -m benchmarks run --books 5000 --baseline baseline.json
+
+``--database-url`` (or ``DATABASE_URL``) selects the database; by default
+a local SQLite file, ``benchmark.sqlite``. Seeding drops every table.
+
+The write scenarios (``loans.return``, ``loans.checkout``, ...) change the
+data, so ``run`` seeds the database again before measuring and every run
+starts from the same rows. ``run --no-seed`` measures the database as it
+is, e.g. one loaded once with ``python -m benchmarks seed``. Scenarios
+marked ``caché`` are GETs behind the response cache: after the warmup,
+those with a fixed URL (``books.list``, ``books.stats``...) measure cache
+hits, not the query behind them.
+"""
@@ -0,0 +1,164 @@
+"""Command line entry point: ``python -m benchmarks``."""
+
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+import anyio
+from click import ClickException, Path as ClickPath, argument, echo, group, option, pass_context
+
+DEFAULT_DATABASE_URL = "sqlite+aiosqlite:///benchmark.sqlite"
+
+SIZE_OPTIONS = (
+    option("--books", type=int, default=2000, show_default=True),
+    option("--users", type=int, default=200, show_default=True),
+    option("--loans", type=int, default=5000, show_default=True),
+    option("--reviews", type=int, default=5000, show_default=True),
+    option("--categories", type=int, default=20, show_default=True),
+    option("--seed", type=int, default=42, show_default=True, help="Semilla del generador."),
+)
+
+
+def size_options(command):
+    for decorator in reversed(SIZE_OPTIONS):
+        command = decorator(command)
+    return command
+
+
+@group()
+@option(
+    "--database-url",
+    envvar="DATABASE_URL",
+    default=DEFAULT_DATABASE_URL,
+    show_default=True,
+    help="Base de datos del benchmark (se importa la app después de fijarla).",
+)
+@pass_context
+def cli(ctx, database_url: str) -> None:
+    """Benchmarks de la API."""
+    # La configuración se lee al importar la app
+    os.environ["DATABASE_URL"] = database_url
+    ctx.obj = database_url
+
+
+@cli.command()
+@size_options
+@option("--yes", is_flag=True, help="No pedir confirmación para borrar una base que no es SQLite.")
+@pass_context
+def seed(ctx, yes: bool, **size) -> None:
+    """Borrar las tablas y cargar el dataset sintético."""
+    from benchmarks.dataset import DatasetSize, seed as seed_dataset
+
+    if not ctx.obj.startswith("sqlite") and not yes:
+        raise ClickException(f"seed borra todas las tablas de {ctx.obj}; repetir con --yes")
+
+    counts = anyio.run(seed_dataset, DatasetSize(**size))
+    for table, total in counts.items():
+        echo(f"{table}: {total}")
+
+
+@cli.command()
+@size_options
+@option("--requests", type=int, default=200, show_default=True, help="Requests medidos por endpoint.")
+@option("--concurrency", type=int, default=10, show_default=True, help="Clientes simultáneos.")
+@option("--warmup", type=int, default=10, show_default=True, help="Requests previos sin medir.")
+@option("--only", multiple=True, help="Endpoints o controladores a medir (books, books.get, ...).")
+@option("--read-only", is_flag=True, help="Omitir los endpoints que escriben.")
+@option("--no-seed", is_flag=True, help="Medir la base tal como está, sin volver a cargar el dataset.")
+@option("--yes", is_flag=True, help="No pedir confirmación para recargar una base que no es SQLite.")
+@option("--output", type=ClickPath(dir_okay=False, path_type=Path), help="Guardar los resultados en JSON.")
+@option("--baseline", type=ClickPath(exists=True, dir_okay=False, path_type=Path), help="Comparar con una corrida anterior.")
+@option("--tolerance", type=float, default=0.2, show_default=True, help="Aumento relativo del p95 tolerado.")
+@option("--min-delta-ms", type=float, default=1.0, show_default=True, help="Aumento absoluto del p95 ignorado.")
+@pass_context
+def run(
+    ctx,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    only: tuple[str, ...],
+    read_only: bool,
+    no_seed: bool,
+    yes: bool,
+    output: Path | None,
+    baseline: Path | None,
+    tolerance: float,
+    min_delta_ms: float,
+    **size,
+) -> None:
+    """Recargar el dataset y medir los endpoints (con ``--no-seed``, el de ``seed``, mismos tamaños)."""
+    from benchmarks.dataset import DatasetSize
+    from benchmarks.runner import run_benchmark
+
+    if not no_seed and not ctx.obj.startswith("sqlite") and not yes:
+        raise ClickException(f"run recarga el dataset y borra todas las tablas de {ctx.obj}; repetir con --yes")
+
+    # Un log INFO por request del cliente de prueba tapa la tabla de resultados
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    echo(f"{'endpoint':<24} {'req':>5} {'err':>4} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'q/req':>6}")
+
+    def show(name, result) -> None:
+        echo(
+            f"{name:<24} {result.requests:>5} {result.errors:>4} {result.throughput_rps:>8.1f} "
+            f"{result.p50_ms:>8.2f} {result.p95_ms:>8.2f} {result.p99_ms:>8.2f} {result.queries_per_request:>6.2f}"
+            f"{'  caché' if result.cached else ''}"
+        )
+
+    results = anyio.run(
+        lambda: run_benchmark(
+            DatasetSize(**size),
+            requests=requests,
+            concurrency=concurrency,
+            warmup=warmup,
+            only=list(only),
+            include_writes=not read_only,
+            on_result=show,
+            reseed=not no_seed,
+        )
+    )
+    echo("caché: GET servido por la caché de respuestas; con una URL fija mide aciertos de caché")
+
+    if output is not None:
+        output.write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n")
+        echo(f"Resultados guardados en {output}")
+
+    if baseline is not None:
+        _report(json.loads(baseline.read_text()), results, tolerance, min_delta_ms)
+
+
+@cli.command()
+@argument("baseline", type=ClickPath(exists=True, dir_okay=False, path_type=Path))
+@argument("current", type=ClickPath(exists=True, dir_okay=False, path_type=Path))
+@option("--tolerance", type=float, default=0.2, show_default=True, help="Aumento relativo del p95 tolerado.")
+@option("--min-delta-ms", type=float, default=1.0, show_default=True, help="Aumento absoluto del p95 ignorado.")
+def compare(baseline: Path, current: Path, tolerance: float, min_delta_ms: float) -> None:
+    """Comparar dos corridas guardadas; termina con código 1 si hay regresiones."""
+    _report(json.loads(baseline.read_text()), json.loads(current.read_text()), tolerance, min_delta_ms)
+
+
+def _report(baseline: dict, current: dict, tolerance: float, min_delta_ms: float) -> None:
+    from benchmarks.runner import compare as compare_runs
+
+    if baseline.get("dataset") != current.get("dataset"):
+        echo("Aviso: las corridas usan datasets distintos", err=True)
+
+    comparisons = compare_runs(baseline, current, tolerance=tolerance, min_delta_ms=min_delta_ms)
+    echo(f"{'endpoint':<24} {'p95 base':>9} {'p95 now':>9} {'q/req':>13}  regresiones")
+    for item in comparisons:
+        echo(
+            f"{item.endpoint:<24} {item.baseline_p95_ms:>9.2f} {item.current_p95_ms:>9.2f} "
+            f"{item.baseline_queries:>6.2f}->{item.current_queries:<6.2f} {'; '.join(item.regressions)}"
+        )
+
+    regressed = [item.endpoint for item in comparisons if item.regressions]
+    if regressed:
+        echo(f"Regresiones en: {', '.join(regressed)}", err=True)
+        sys.exit(1)
+    echo("Sin regresiones")
+
+
+if __name__ == "__main__":
+    cli()
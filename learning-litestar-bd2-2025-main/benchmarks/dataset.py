@@ -0,0 +1,171 @@
+"""Synthetic, reproducible dataset for the benchmarks."""
+
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any
+
+from advanced_alchemy.base import AdvancedDeclarativeBase
+from sqlalchemy import insert, select, text
+
+from app.db import sqlalchemy_config
+from app.models import Book, BookCategory, Category, Loan, LoanStatus, Review, User
+from app.passwords import password_hasher
+from app.repositories.book import BookRepository
+from app.repositories.loan import LoanRepository
+
+BENCHMARK_PASSWORD = "benchmark"
+INSERT_BATCH_SIZE = 1000
+
+LANGUAGES = ("es", "en", "fr", "pt", "de")
+WORDS = (
+    "sombra", "mar", "ciudad", "tiempo", "noche", "jardín", "río", "memoria",
+    "viento", "camino", "silencio", "fuego", "isla", "casa", "invierno", "luz",
+)
+SURNAMES = ("García", "Rojas", "Muñoz", "Soto", "Silva", "Pérez", "Díaz", "Vargas")
+
+
+@dataclass
+class DatasetSize:
+    """How many rows of each table to generate."""
+
+    books: int = 2000
+    users: int = 200
+    loans: int = 5000
+    reviews: int = 5000
+    categories: int = 20
+    seed: int = 42
+
+
+def _batches(rows: list[dict[str, Any]]) -> list[list[dict[str, Any]]]:
+    return [rows[start:start + INSERT_BATCH_SIZE] for start in range(0, len(rows), INSERT_BATCH_SIZE)]
+
+
+def _rows(size: DatasetSize, password_hash: str) -> dict[type, list[dict[str, Any]]]:
+    """Rows of every table; ids are assigned explicitly so references are stable."""
+    rng = random.Random(size.seed)
+    today = date.today()
+
+    categories = [
+        {"id": index, "name": f"Categoría {index}", "description": f"Libros de {rng.choice(WORDS)}"}
+        for index in range(1, size.categories + 1)
+    ]
+    users = [
+        {
+            "id": index,
+            "username": f"user{index}",
+            "fullname": f"Usuario {index} {rng.choice(SURNAMES)}",
+            "password": password_hash,
+            "email": f"user{index}@example.com",
+            "is_active": True,
+        }
+        for index in range(1, size.users + 1)
+    ]
+    books = [
+        {
+            "id": index,
+            "title": f"{rng.choice(WORDS).capitalize()} de {rng.choice(WORDS)} {index}",
+            "author": f"{rng.choice(SURNAMES)} {rng.choice(SURNAMES)}",
+            "isbn": f"978{index:010d}",
+            "pages": rng.randint(80, 900),
+            "published_year": rng.randint(1900, 2024),
+            # Stock holgado para que los checkouts del benchmark no se agoten
+            "stock": rng.randint(50, 500),
+            "description": " ".join(rng.choices(WORDS, k=12)),
+            "language": rng.choice(LANGUAGES),
+            "publisher": f"Editorial {rng.choice(SURNAMES)}",
+        }
+        for index in range(1, size.books + 1)
+    ]
+    book_categories = [
+        {"book_id": book["id"], "category_id": category_id}
+        for book in books
+        for category_id in rng.sample(range(1, size.categories + 1), k=min(rng.randint(1, 3), size.categories))
+    ] if size.categories else []
+
+    loans = []
+    for index in range(1, size.loans + 1):
+        loan_dt = today - timedelta(days=rng.randint(0, 365))
+        due_date = loan_dt + timedelta(days=14)
+        status = rng.choice((LoanStatus.ACTIVE, LoanStatus.RETURNED, LoanStatus.RETURNED))
+        if status is LoanStatus.ACTIVE and due_date < today:
+            status = LoanStatus.OVERDUE
+        loans.append({
+            "id": index,
+            "user_id": rng.randint(1, size.users),
+            "book_id": rng.randint(1, size.books),
+            "loan_dt": loan_dt,
+            "due_date": due_date,
+            "status": status,
+            "return_dt": loan_dt + timedelta(days=rng.randint(1, 20)) if status is LoanStatus.RETURNED else None,
+        })
+
+    # Una reseña por usuario y libro
+    pairs = set()
+    while len(pairs) < min(size.reviews, size.users * size.books):
+        pairs.add((rng.randint(1, size.users), rng.randint(1, size.books)))
+    reviews = [
+        {
+            "id": index,
+            "user_id": user_id,
+            "book_id": book_id,
+            "rating": rng.randint(1, 5),
+            "comment": " ".join(rng.choices(WORDS, k=8)),
+            "review_date": today - timedelta(days=rng.randint(0, 365)),
+        }
+        for index, (user_id, book_id) in enumerate(sorted(pairs), start=1)
+    ]
+
+    return {
+        Category: categories,
+        User: users,
+        Book: books,
+        BookCategory: book_categories,
+        Loan: loans,
+        Review: reviews,
+    }
+
+
+async def seed(size: DatasetSize) -> dict[str, int]:
+    """
+    Drop and recreate every table, then fill them with a synthetic dataset.
+
+    The same ``size`` (including ``seed``) always produces the same rows.
+    Every user can log in with :data:`BENCHMARK_PASSWORD`.
+    """
+    engine = sqlalchemy_config.get_engine()
+    postgres = engine.dialect.name == "postgresql"
+    async with engine.begin() as conn:
+        if postgres:
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.run_sync(AdvancedDeclarativeBase.metadata.drop_all)
+        await conn.run_sync(AdvancedDeclarativeBase.metadata.create_all)
+
+    # Todos los usuarios comparten el hash: Argon2 es lento a propósito
+    rows = _rows(size, await password_hasher.hash(BENCHMARK_PASSWORD))
+
+    async with sqlalchemy_config.get_session() as session:
+        for model, model_rows in rows.items():
+            for batch in _batches(model_rows):
+                await session.execute(insert(model), batch)
+        await BookRepository(session=session).refresh_review_stats()
+
+        if postgres:
+            # Los ids se dieron a mano: avanzar las secuencias
+            for model in rows:
+                table = model.__tablename__
+                await session.execute(text(
+                    f"SELECT setval('{table}_id_seq', COALESCE((SELECT MAX(id) FROM {table}), 1))"
+                ))
+        await session.commit()
+        await LoanRepository(session=session).rebuild_co_borrows()
+
+    return {model.__tablename__: len(model_rows) for model, model_rows in rows.items()}
+
+
+async def open_loan_ids() -> list[int]:
+    """Ids of the loans that are still active or overdue in the database."""
+    async with sqlalchemy_config.get_session() as session:
+        return list(await session.scalars(
+            select(Loan.id).where(Loan.status != LoanStatus.RETURNED).order_by(Loan.id)
+        ))
@@ -0,0 +1,333 @@
+"""Drive the API through its ASGI interface and measure every endpoint."""
+
+import math
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from itertools import count
+from typing import Any, Callable, Iterator
+
+import anyio
+from httpx import Response
+from litestar.testing import AsyncTestClient
+
+from app import app
+from app.db import sqlalchemy_config
+from app.metrics import request_queries
+from benchmarks.dataset import BENCHMARK_PASSWORD, LANGUAGES, DatasetSize, open_loan_ids, seed
+
+WORDS = ("mar", "noche", "camino", "luz")
+SURNAMES = ("García", "Rojas", "Soto")
+
+
+@dataclass
+class Call:
+    """One HTTP request of a scenario."""
+
+    method: str
+    url: str
+    json: Any = None
+    data: dict[str, str] | None = None
+    authenticated: bool = True
+
+
+@dataclass
+class Scenario:
+    """An endpoint to benchmark and how to build each request to it."""
+
+    name: str
+    build: Callable[[random.Random, "Workload"], Call]
+    writes: bool = False
+    # GET servido por la caché de respuestas después del primer request a cada URL
+    cached: bool = False
+
+
+@dataclass
+class Workload:
+    """The dataset the scenarios draw ids from."""
+
+    size: DatasetSize
+    # Préstamos abiertos en la base que aún no se devolvieron en esta corrida
+    open_loans: Iterator[int]
+
+
+@dataclass
+class EndpointResult:
+    """Latency, throughput and queries of one scenario."""
+
+    requests: int
+    errors: int
+    throughput_rps: float
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    queries_per_request: float
+    status_codes: dict[str, int] = field(default_factory=dict)
+    cached: bool = False
+
+
+def _id(rng: random.Random, total: int) -> int:
+    return rng.randint(1, max(total, 1))
+
+
+def _ids(rng: random.Random, total: int, count: int = 20) -> str:
+    return ",".join(str(_id(rng, total)) for _ in range(count))
+
+
+SCENARIOS = [
+    # BookController
+    Scenario("books.list", lambda rng, load: Call("GET", "/books/?limit=20"), cached=True),
+    Scenario("books.list_expand", lambda rng, load: Call("GET", "/books/?limit=20&expand=categories&expand=reviews"), cached=True),
+    Scenario("books.list_fields", lambda rng, load: Call("GET", "/books/?limit=20&fields=id,title,author,stock"), cached=True),
+    Scenario("books.get", lambda rng, load: Call("GET", f"/books/{_id(rng, load.size.books)}"), cached=True),
+    Scenario("books.batch", lambda rng, load: Call("GET", f"/books/batch?ids={_ids(rng, load.size.books)}"), cached=True),
+    Scenario("books.search", lambda rng, load: Call("GET", f"/books/search?q={rng.choice(WORDS)}")),
+    Scenario("books.search_title", lambda rng, load: Call("GET", f"/books/search?title={rng.choice(WORDS)}")),
+    Scenario("books.filter", lambda rng, load: Call("GET", f"/books/filter?from={(year := rng.randint(1900, 2020))}&to={year + 4}")),
+    Scenario("books.recent", lambda rng, load: Call("GET", "/books/recent?limit=10")),
+    Scenario("books.stats", lambda rng, load: Call("GET", "/books/stats"), cached=True),
+    Scenario("books.available", lambda rng, load: Call("GET", "/books/available")),
+    Scenario("books.by_category", lambda rng, load: Call("GET", f"/books/by-category/{_id(rng, load.size.categories)}")),
+    Scenario("books.most_reviewed", lambda rng, load: Call("GET", "/books/most-reviewed?limit=10"), cached=True),
+    Scenario("books.also_borrowed", lambda rng, load: Call("GET", f"/books/{_id(rng, load.size.books)}/also-borrowed"), cached=True),
+    Scenario("books.similar", lambda rng, load: Call("GET", f"/books/{_id(rng, load.size.books)}/similar"), cached=True),
+    Scenario("books.facets", lambda rng, load: Call("GET", f"/books/facets?language={rng.choice(LANGUAGES)}&category={_id(rng, load.size.categories)}"), cached=True),
+    Scenario("books.top_rated", lambda rng, load: Call("GET", "/books/top-rated?limit=10&min_reviews=2"), cached=True),
+    Scenario("books.search_by_author", lambda rng, load: Call("GET", f"/books/search-by-author?author_name={rng.choice(SURNAMES)}")),
+    Scenario("books.export", lambda rng, load: Call("GET", "/books/export?format=jsonl")),
+    Scenario(
+        "books.update",
+        lambda rng, load: Call("PATCH", f"/books/{_id(rng, load.size.books)}", json={"pages": rng.randint(80, 900)}),
+        writes=True,
+    ),
+    Scenario(
+        "books.update_stock",
+        lambda rng, load: Call("PATCH", f"/books/{_id(rng, load.size.books)}/stock?quantity=1"),
+        writes=True,
+    ),
+    # LoanController
+    Scenario("loans.list", lambda rng, load: Call("GET", "/loans/?limit=20")),
+    Scenario("loans.list_expand", lambda rng, load: Call("GET", "/loans/?limit=20&expand=user&expand=book")),
+    Scenario("loans.get", lambda rng, load: Call("GET", f"/loans/{_id(rng, load.size.loans)}")),
+    Scenario("loans.batch", lambda rng, load: Call("GET", f"/loans/batch?ids={_ids(rng, load.size.loans)}&expand=book")),
+    Scenario(
+        "loans.checkout",
+        lambda rng, load: Call(
+            "POST", "/loans/checkout",
+            json={"user_id": _id(rng, load.size.users), "book_ids": [_id(rng, load.size.books)]},
+        ),
+        writes=True,
+    ),
+    Scenario(
+        # Cada request devuelve un préstamo abierto distinto de la base
+        "loans.return",
+        lambda rng, load: Call("POST", f"/loans/{next(load.open_loans, 0)}/return"),
+        writes=True,
+    ),
+    # UserController
+    Scenario("users.list", lambda rng, load: Call("GET", "/users/?limit=20")),
+    Scenario("users.get", lambda rng, load: Call("GET", f"/users/{_id(rng, load.size.users)}")),
+    Scenario("users.batch", lambda rng, load: Call("GET", f"/users/batch?ids={_ids(rng, load.size.users)}")),
+    Scenario(
+        "users.update",
+        lambda rng, load: Call("PATCH", f"/users/{_id(rng, load.size.users)}", json={"fullname": f"Usuario {rng.randint(1, 10**6)}"}),
+        writes=True,
+    ),
+    # AuthController
+    Scenario(
+        "auth.login",
+        lambda rng, load: Call(
+            "POST", "/auth/login",
+            data={"username": f"user{_id(rng, load.size.users)}", "password": BENCHMARK_PASSWORD},
+            authenticated=False,
+        ),
+    ),
+]
+
+
+def _percentile(sorted_values: list[float], percentile: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(percentile / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def _query_totals() -> tuple[int, float]:
+    """Requests and queries recorded so far by the metrics middleware."""
+    requests, queries = 0, 0.0
+    for counts, total in request_queries.observations.values():
+        requests += sum(counts)
+        queries += total[0]
+    return requests, queries
+
+
+async def _send(client: AsyncTestClient, call: Call, headers: dict[str, str]) -> Response:
+    return await client.request(
+        call.method,
+        call.url,
+        json=call.json,
+        data=call.data,
+        headers=headers if call.authenticated else None,
+    )
+
+
+async def _run_scenario(
+    client: AsyncTestClient,
+    scenario: Scenario,
+    load: Workload,
+    headers: dict[str, str],
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    rng: random.Random,
+) -> EndpointResult:
+    for _ in range(warmup):
+        await _send(client, scenario.build(rng, load), headers)
+
+    latencies: list[float] = []
+    status_codes: dict[str, int] = {}
+    remaining = count(requests, -1)
+
+    async def worker() -> None:
+        while next(remaining) > 0:
+            call = scenario.build(rng, load)
+            start = time.perf_counter()
+            response = await _send(client, call, headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            key = str(response.status_code)
+            status_codes[key] = status_codes.get(key, 0) + 1
+
+    requests_before, queries_before = _query_totals()
+    start = time.perf_counter()
+    async with anyio.create_task_group() as task_group:
+        for _ in range(concurrency):
+            task_group.start_soon(worker)
+    elapsed = time.perf_counter() - start
+    requests_after, queries_after = _query_totals()
+
+    latencies.sort()
+    measured = requests_after - requests_before
+    return EndpointResult(
+        requests=len(latencies),
+        errors=sum(total for code, total in status_codes.items() if int(code) >= 400),
+        throughput_rps=round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        mean_ms=round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        p50_ms=round(_percentile(latencies, 50), 3),
+        p95_ms=round(_percentile(latencies, 95), 3),
+        p99_ms=round(_percentile(latencies, 99), 3),
+        queries_per_request=round((queries_after - queries_before) / measured, 2) if measured else 0.0,
+        status_codes=status_codes,
+        cached=scenario.cached,
+    )
+
+
+async def run_benchmark(
+    size: DatasetSize,
+    requests: int = 200,
+    concurrency: int = 10,
+    warmup: int = 10,
+    only: list[str] | None = None,
+    include_writes: bool = True,
+    on_result: Callable[[str, EndpointResult], None] | None = None,
+    reseed: bool = True,
+) -> dict[str, Any]:
+    """
+    Run every selected scenario against the real app and collect its results.
+
+    Scenarios run one after another, each with ``concurrency`` concurrent
+    clients sending ``requests`` requests in total after ``warmup`` ones.
+    Queries per request come from the metrics middleware, so they include
+    the queries of authentication and of the response cache misses.
+
+    The write scenarios change the data, so unless ``reseed`` is false the
+    database is seeded again first and every run starts from the same rows.
+    Scenarios marked ``cached`` go through the response cache: with a fixed
+    URL they measure cache hits after the warmup, with random ids a mix.
+    """
+    scenarios = [
+        scenario for scenario in SCENARIOS
+        if (include_writes or not scenario.writes)
+        and (not only or any(scenario.name == name or scenario.name.startswith(f"{name}.") for name in only))
+    ]
+    if reseed:
+        await seed(size)
+    rng = random.Random(size.seed)
+    load = Workload(size=size, open_loans=iter(await open_loan_ids()))
+    results: dict[str, EndpointResult] = {}
+
+    async with AsyncTestClient(app=app) as client:
+        login = await client.post("/auth/login", data={"username": "user1", "password": BENCHMARK_PASSWORD})
+        login.raise_for_status()
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        for scenario in scenarios:
+            result = await _run_scenario(client, scenario, load, headers, requests, concurrency, warmup, rng)
+            results[scenario.name] = result
+            if on_result is not None:
+                on_result(scenario.name, result)
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "database": sqlalchemy_config.get_engine().dialect.name,
+        "dataset": asdict(size),
+        "requests": requests,
+        "concurrency": concurrency,
+        "warmup": warmup,
+        "endpoints": {name: asdict(result) for name, result in results.items()},
+    }
+
+
+@dataclass
+class Comparison:
+    """Change of one endpoint between a baseline and a new run."""
+
+    endpoint: str
+    baseline_p95_ms: float
+    current_p95_ms: float
+    baseline_queries: float
+    current_queries: float
+    regressions: list[str]
+
+
+def compare(
+    baseline: dict[str, Any],
+    current: dict[str, Any],
+    tolerance: float = 0.2,
+    min_delta_ms: float = 1.0,
+) -> list[Comparison]:
+    """
+    Compare two runs endpoint by endpoint.
+
+    p95 latency regresses when it grows more than ``tolerance`` (relative)
+    and ``min_delta_ms`` (absolute, to ignore noise on fast endpoints).
+    Any increase in queries per request, or in errors, is a regression.
+    """
+    comparisons = []
+    for name, now in current["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if before is None:
+            continue
+
+        regressions = []
+        delta = now["p95_ms"] - before["p95_ms"]
+        if delta > min_delta_ms and now["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"p95 {before['p95_ms']:.1f} -> {now['p95_ms']:.1f} ms")
+        if now["queries_per_request"] > before["queries_per_request"] + 0.01:
+            regressions.append(
+                f"consultas/request {before['queries_per_request']} -> {now['queries_per_request']}"
+            )
+        if now["errors"] > before["errors"]:
+            regressions.append(f"errores {before['errors']} -> {now['errors']}")
+
+        comparisons.append(Comparison(
+            endpoint=name,
+            baseline_p95_ms=before["p95_ms"],
+            current_p95_ms=now["p95_ms"],
+            baseline_queries=before["queries_per_request"],
+            current_queries=now["queries_per_request"],
+            regressions=regressions,
+        ))
+    return comparisons
@@ -0,0 +1,48 @@
+"""add book search indexes
+
+Revision ID: 57cbecc5771f
+Revises: f83ebccff6d9
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import advanced_alchemy
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '57cbecc5771f'
+down_revision: Union[str, Sequence[str], None] = 'f83ebccff6d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_COLUMNS = ("title", "author", "description")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Los índices trigram solo existen en PostgreSQL
+    if op.get_context().dialect.name != "postgresql":
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in SEARCH_COLUMNS:
+        op.create_index(
+            f"ix_books_{column}_trgm",
+            "books",
+            [column],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_ops={column: "gin_trgm_ops"},
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_context().dialect.name != "postgresql":
+        return
+
+    for column in reversed(SEARCH_COLUMNS):
+        op.drop_index(f"ix_books_{column}_trgm", table_name="books")
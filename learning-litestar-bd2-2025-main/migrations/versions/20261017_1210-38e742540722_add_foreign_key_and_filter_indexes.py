@@ -0,0 +1,64 @@
+"""add foreign key and filter indexes
+
+Revision ID: 38e742540722
+Revises: 57cbecc5771f
+Create Date: 2026-10-17 12:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+import advanced_alchemy
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '38e742540722'
+down_revision: Union[str, Sequence[str], None] = '57cbecc5771f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_loans_user_id'), 'loans', ['user_id'], unique=False)
+    op.create_index(op.f('ix_loans_book_id'), 'loans', ['book_id'], unique=False)
+    op.create_index('ix_loans_status_due_date', 'loans', ['status', 'due_date'], unique=False)
+    op.create_index(op.f('ix_reviews_user_id'), 'reviews', ['user_id'], unique=False)
+    op.create_index(op.f('ix_reviews_book_id'), 'reviews', ['book_id'], unique=False)
+    op.create_index(op.f('ix_books_published_year'), 'books', ['published_year'], unique=False)
+    op.create_index('ix_books_created_at_id', 'books', ['created_at', 'id'], unique=False)
+    op.create_index(
+        'ix_books_in_stock',
+        'books',
+        ['id'],
+        unique=False,
+        postgresql_where=sa.text('stock > 0'),
+        sqlite_where=sa.text('stock > 0'),
+    )
+
+    # Eliminar categorías duplicadas antes de la restricción única
+    op.execute(
+        "DELETE FROM book_categories WHERE id NOT IN ("
+        "SELECT MIN(id) FROM book_categories GROUP BY book_id, category_id)"
+    )
+    op.create_index(op.f('ix_book_categories_category_id'), 'book_categories', ['category_id'], unique=False)
+    with op.batch_alter_table('book_categories') as batch_op:
+        batch_op.create_unique_constraint(
+            op.f('uq_book_categories_book_id'), ['book_id', 'category_id']
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('book_categories') as batch_op:
+        batch_op.drop_constraint(op.f('uq_book_categories_book_id'), type_='unique')
+    op.drop_index(op.f('ix_book_categories_category_id'), table_name='book_categories')
+    op.drop_index('ix_books_in_stock', table_name='books')
+    op.drop_index('ix_books_created_at_id', table_name='books')
+    op.drop_index(op.f('ix_books_published_year'), table_name='books')
+    op.drop_index(op.f('ix_reviews_book_id'), table_name='reviews')
+    op.drop_index(op.f('ix_reviews_user_id'), table_name='reviews')
+    op.drop_index('ix_loans_status_due_date', table_name='loans')
+    op.drop_index(op.f('ix_loans_book_id'), table_name='loans')
+    op.drop_index(op.f('ix_loans_user_id'), table_name='loans')
@@ -0,0 +1,43 @@
+"""add review stats to books
+
+Revision ID: aa1619e274ce
+Revises: 38e742540722
+Create Date: 2026-10-17 12:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+import advanced_alchemy
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'aa1619e274ce'
+down_revision: Union[str, Sequence[str], None] = '38e742540722'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('books', sa.Column('review_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('books', sa.Column('avg_rating', sa.Numeric(precision=3, scale=2), nullable=True))
+
+    # Calcular las estadísticas de las reseñas existentes
+    op.execute(
+        "UPDATE books SET "
+        "review_count = (SELECT COUNT(*) FROM reviews WHERE reviews.book_id = books.id), "
+        "avg_rating = (SELECT AVG(rating) FROM reviews WHERE reviews.book_id = books.id)"
+    )
+
+    op.create_index('ix_books_review_count', 'books', ['review_count'], unique=False)
+    op.create_index('ix_books_avg_rating_review_count', 'books', ['avg_rating', 'review_count'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_books_avg_rating_review_count', table_name='books')
+    op.drop_index('ix_books_review_count', table_name='books')
+    op.drop_column('books', 'avg_rating')
+    op.drop_column('books', 'review_count')
@@ -0,0 +1,48 @@
+"""add book co-borrows index
+
+Revision ID: 5b0e3c1f7a21
+Revises: aa1619e274ce
+Create Date: 2026-10-17 12:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+import advanced_alchemy
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b0e3c1f7a21'
+down_revision: Union[str, Sequence[str], None] = 'aa1619e274ce'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('book_co_borrows',
+    sa.Column('book_id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('other_book_id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('borrowers', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], name=op.f('fk_book_co_borrows_book_id_books'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['other_book_id'], ['books.id'], name=op.f('fk_book_co_borrows_other_book_id_books'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('book_id', 'other_book_id', name=op.f('pk_book_co_borrows'))
+    )
+    op.create_index('ix_book_co_borrows_ranking', 'book_co_borrows', ['book_id', 'borrowers', 'other_book_id'], unique=False)
+
+    # Llenar el índice con los préstamos existentes (un par por usuario)
+    op.execute(
+        "INSERT INTO book_co_borrows (book_id, other_book_id, borrowers) "
+        "SELECT a.book_id, b.book_id, COUNT(*) "
+        "FROM (SELECT DISTINCT user_id, book_id FROM loans) a "
+        "JOIN (SELECT DISTINCT user_id, book_id FROM loans) b "
+        "ON b.user_id = a.user_id AND b.book_id != a.book_id "
+        "GROUP BY a.book_id, b.book_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_book_co_borrows_ranking', table_name='book_co_borrows')
+    op.drop_table('book_co_borrows')